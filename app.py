@@ -4,20 +4,23 @@ A comprehensive PDF processing web application with merge, split, compress, conv
 """
 
 import os
+import re
 import sys
+import time
+import hashlib
 import uuid
+import secrets
+import itertools
 import tempfile
-from datetime import datetime, timedelta
-from flask import Flask, request, render_template, jsonify, send_file, redirect, url_for, flash
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from flask import Flask, request, render_template, jsonify, send_file, redirect, url_for, flash, make_response
 from werkzeug.utils import secure_filename
 import shutil
 
-# Import our PDF processing modules
-from modules.pdf_merger import PDFMerger
-from modules.pdf_splitter import PDFSplitter
-from modules.pdf_compressor import PDFCompressor
-from modules.pdf_converter import PDFConverter
-from modules.pdf_unlocker import PDFUnlocker
+# PDF processing modules are imported lazily (see get_pdf_merger() etc.)
+from modules.bufpool import BufferPool, copy_stream
 from modules.error_handler import ErrorHandler, PDFToolkitError, FileValidationError, ProcessingError
 
 app = Flask(__name__)
@@ -32,95 +35,317 @@ app.config['OUTPUT_FOLDER'] = 'outputs'
 UPLOAD_FOLDER = 'uploads'
 OUTPUT_FOLDER = 'outputs'
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB max file size
-ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'bmp', 'tiff', 'gif'}
+ALLOWED_EXTENSIONS = frozenset({'pdf', 'png', 'jpg', 'jpeg', 'bmp', 'tiff', 'gif'})
+FILE_TTL = 3600  # Uploaded and generated files live for 1 hour
+CLEANUP_INTERVAL = 60  # Janitor wakes up once a minute
+UPLOAD_BUFFER_SIZE = 1024 * 1024  # Pooled copy buffer for streaming uploads to disk
+ZIP_COPY_BUFFER = 1024 * 1024  # Copy buffer when packing results into zip archives
+PDF_INFO_CACHE_SIZE = 256  # Recently inspected PDFs kept by content hash
+STATIC_PAGE_MAX_AGE = 300  # Browser cache lifetime for the tool pages (seconds)
+
+# LRU of pdf-info results keyed by the upload's SHA-256 (digest -> info dict)
+_pdf_info_cache = OrderedDict()
+_pdf_info_lock = threading.Lock()
+
+# Page range lists such as "1-3, 5, 7-9"
+_PAGE_RANGES_RE = re.compile(r'\s*\d+\s*(?:-\s*\d+\s*)?(?:,\s*\d+\s*(?:-\s*\d+\s*)?)*')
+_PAGE_RANGE_ITEM_RE = re.compile(r'(\d+)(?:\s*-\s*(\d+))?')
+
+# Cheap process-local IDs for internal (never downloadable) file names
+_id_prefix = f"{secrets.token_hex(4)}{os.getpid():x}"
+_id_counter = itertools.count()
+
+# Expiry index of every file we wrote, oldest first (path -> expiry timestamp)
+_file_registry = OrderedDict()
+_registry_lock = threading.Lock()
+
+_dirs_ready = False
+
+
+def ensure_directories():
+    """Create the upload and output folders once per process."""
+    global _dirs_ready
+    if _dirs_ready:
+        return
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    _dirs_ready = True
+
 
 # Ensure directories exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+ensure_directories()
+
+
+# PDF processing classes are created on first use so that cold starts and
+# requests for pages/downloads do not pay for importing pypdf, Pillow, etc.
+@lru_cache(maxsize=None)
+def get_pdf_merger():
+    """Return the shared PDFMerger instance."""
+    from modules.pdf_merger import PDFMerger
+    return PDFMerger()
+
+
+@lru_cache(maxsize=None)
+def get_pdf_splitter():
+    """Return the shared PDFSplitter instance."""
+    from modules.pdf_splitter import PDFSplitter
+    return PDFSplitter()
+
+
+@lru_cache(maxsize=None)
+def get_pdf_compressor():
+    """Return the shared PDFCompressor instance."""
+    from modules.pdf_compressor import PDFCompressor
+    return PDFCompressor()
+
+
+@lru_cache(maxsize=None)
+def get_pdf_converter():
+    """Return the shared PDFConverter instance."""
+    from modules.pdf_converter import PDFConverter
+    return PDFConverter()
+
+
+@lru_cache(maxsize=None)
+def get_pdf_unlocker():
+    """Return the shared PDFUnlocker instance."""
+    from modules.pdf_unlocker import PDFUnlocker
+    return PDFUnlocker()
 
-# Initialize PDF processing classes
-pdf_merger = PDFMerger()
-pdf_splitter = PDFSplitter()
-pdf_compressor = PDFCompressor()
-pdf_converter = PDFConverter()
-pdf_unlocker = PDFUnlocker()
+
+# Reusable copy buffers for saving uploads (one per concurrently saving thread)
+_upload_buffers = BufferPool(size=UPLOAD_BUFFER_SIZE, count=(os.cpu_count() or 1) * 2)
 
 
 def allowed_file(filename):
     """Check if file extension is allowed."""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    _, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in ALLOWED_EXTENSIONS
+
+
+def is_pdf_upload(file):
+    """Check that an uploaded file is present and has a .pdf extension."""
+    if not file or not file.filename:
+        return False
+    return file.filename[-4:].lower() == '.pdf'
+
+
+def new_internal_id():
+    """
+    Return a unique ID for uploads and scratch directories.
+    
+    Download names keep using uuid4 because they must not be guessable.
+    """
+    return f"{_id_prefix}{next(_id_counter):x}"
+
+
+def parse_page_ranges(ranges_str):
+    """
+    Parse a page range list like "1-3, 5" into (start, end, is_range) tuples.
+    
+    Raises:
+        ValueError: If the string is not a comma-separated list of pages/ranges
+    """
+    if not _PAGE_RANGES_RE.fullmatch(ranges_str):
+        raise ValueError(f"Invalid page ranges: {ranges_str}")
+    return [
+        (int(start), int(end or start), bool(end))
+        for start, end in _PAGE_RANGE_ITEM_RE.findall(ranges_str)
+    ]
+
+
+def register_file(path, expires_at=None):
+    """Record a saved file (or output directory) so the janitor can expire it."""
+    if expires_at is None:
+        expires_at = time.time() + FILE_TTL
+    with _registry_lock:
+        _file_registry[path] = expires_at
+        _file_registry.move_to_end(path)
+
+
+def purge_expired_files(now=None):
+    """Delete registered files whose TTL has elapsed."""
+    now = now or time.time()
+    expired = []
+    with _registry_lock:
+        while _file_registry:
+            path, expires_at = next(iter(_file_registry.items()))
+            if expires_at > now:
+                break
+            _file_registry.popitem(last=False)
+            expired.append(path)
+    
+    for path in expired:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error cleaning up {path}: {str(e)}")
 
 
 def cleanup_old_files():
-    """Clean up old uploaded and output files (older than 1 hour)."""
+    """Clean up files older than 1 hour left on disk and register the rest for expiry."""
     try:
-        current_time = datetime.now()
+        cutoff = time.time() - FILE_TTL
+        survivors = []
         for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER]:
-            if os.path.exists(folder):
-                for filename in os.listdir(folder):
-                    file_path = os.path.join(folder, filename)
-                    if os.path.isfile(file_path):
-                        file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-                        if current_time - file_time > timedelta(hours=1):
-                            os.remove(file_path)
+            if not os.path.exists(folder):
+                continue
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    created = entry.stat(follow_symlinks=False).st_ctime
+                    if created < cutoff:
+                        os.unlink(entry.path)
+                    else:
+                        survivors.append((created + FILE_TTL, entry.path))
+        
+        # Keep the registry ordered by expiry so the janitor only inspects its head
+        for expires_at, file_path in sorted(survivors):
+            register_file(file_path, expires_at)
     except Exception as e:
         print(f"Error cleaning up files: {str(e)}")
 
 
-@app.before_request
-def before_request():
-    """Run cleanup before each request."""
-    cleanup_old_files()
+def save_upload(file_storage, path):
+    """
+    Stream an uploaded file straight to its final path and register it for expiry.
+    
+    The content is hashed while it is copied, so callers can deduplicate
+    uploads without reading them a second time.
+    
+    Returns:
+        Hex digest of the uploaded content
+    """
+    stream = file_storage.stream
+    digest = hashlib.sha256()
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as output_file:
+        if hasattr(stream, 'readinto'):
+            copy_stream(stream, output_file, _upload_buffers, digest)
+        else:
+            for chunk in iter(lambda: stream.read(UPLOAD_BUFFER_SIZE), b''):
+                output_file.write(chunk)
+                digest.update(chunk)
+    register_file(path)
+    return digest.hexdigest()
+
+
+def get_cached_pdf_info(digest):
+    """Return cached pdf-info for a content digest, or None."""
+    with _pdf_info_lock:
+        info = _pdf_info_cache.get(digest)
+        if info is not None:
+            _pdf_info_cache.move_to_end(digest)
+        return info
+
+
+def cache_pdf_info(digest, info):
+    """Remember pdf-info for a content digest, evicting the least recently used."""
+    with _pdf_info_lock:
+        _pdf_info_cache[digest] = info
+        _pdf_info_cache.move_to_end(digest)
+        while len(_pdf_info_cache) > PDF_INFO_CACHE_SIZE:
+            _pdf_info_cache.popitem(last=False)
+
+
+def write_zip(zip_path, file_paths):
+    """
+    Pack result files into a zip archive without recompressing them.
+    
+    PDFs and images are already compressed, so entries are stored as-is.
+    """
+    import zipfile
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zipf:
+        for file_path in file_paths:
+            # Add file to zip with just the filename (not full path)
+            info = zipfile.ZipInfo.from_file(file_path, os.path.basename(file_path))
+            info.compress_type = zipfile.ZIP_STORED
+            with open(file_path, 'rb') as src, zipf.open(info, 'w') as dest:
+                shutil.copyfileobj(src, dest, ZIP_COPY_BUFFER)
+
+
+def _janitor_loop():
+    """Background loop that expires registered files."""
+    while True:
+        time.sleep(CLEANUP_INTERVAL)
+        purge_expired_files()
+
+
+# Sweep leftovers from a previous run once, then expire files in the background
+cleanup_old_files()
+threading.Thread(target=_janitor_loop, name='file-janitor', daemon=True).start()
+
+
+@lru_cache(maxsize=8)
+def _render_static_page(template_name):
+    """Render a template without per-request data once and reuse the HTML."""
+    return render_template(template_name)
+
+
+def static_page(template_name):
+    """Serve a page that only depends on its template, with browser caching."""
+    if app.debug:
+        # Pick up template edits while developing
+        html = render_template(template_name)
+    else:
+        html = _render_static_page(template_name)
+    response = make_response(html)
+    response.headers['Cache-Control'] = f'public, max-age={STATIC_PAGE_MAX_AGE}'
+    return response
 
 
 @app.route('/')
 def index():
     """Main page with feature selection."""
-    return render_template('index.html')
+    return static_page('index.html')
 
 
 @app.route('/merge')
 def merge_page():
     """PDF merge page."""
-    return render_template('merge.html')
+    return static_page('merge.html')
 
 
 @app.route('/split')
 def split_page():
     """PDF split page."""
-    return render_template('split.html')
+    return static_page('split.html')
 
 
 @app.route('/compress')
 def compress_page():
     """PDF compress page."""
-    return render_template('compress.html')
+    return static_page('compress.html')
 
 
 @app.route('/convert')
 def convert_page():
     """PDF convert page."""
-    return render_template('convert.html')
+    return static_page('convert.html')
 
 
 @app.route('/unlock')
 def unlock_page():
     """PDF unlock page."""
-    return render_template('unlock.html')
+    return static_page('unlock.html')
 
 
 @app.route('/api/merge', methods=['POST'])
 def api_merge_pdfs():
     """API endpoint to merge PDF files."""
     try:
-        ErrorHandler.log_operation("merge_pdfs_request", {"files_count": len(request.files.getlist('files'))})
+        files = request.files.getlist('files')
+        ErrorHandler.log_operation("merge_pdfs_request", {"files_count": len(files)})
         
         if 'files' not in request.files:
             return jsonify(ErrorHandler.create_error_response('No files uploaded', 'NO_FILES')[0])
         
-        files = request.files.getlist('files')
-        
         # Validate multiple files
         validation = ErrorHandler.validate_multiple_files(files, ErrorHandler.ALLOWED_PDF_EXTENSIONS, max_files=10)
         
@@ -136,17 +361,25 @@ def api_merge_pdfs():
                 'INSUFFICIENT_FILES'
             )[0])
         
-        # Save uploaded files
+        # Save uploaded files, writing identical uploads (same content) only once
         uploaded_paths = []
+        saved_by_digest = {}
         for file_info in validation['valid_files']:
-            filename = f"{uuid.uuid4()}_{file_info['filename']}"
+            filename = f"{new_internal_id()}_{file_info['filename']}"
             file_path = os.path.join(UPLOAD_FOLDER, filename)
-            file_info['file'].save(file_path)
+            digest = save_upload(file_info['file'], file_path)
+            # The content is only known once saved; drop a repeat and reuse the first copy
+            if digest in saved_by_digest:
+                os.remove(file_path)
+                file_path = saved_by_digest[digest]
+            else:
+                saved_by_digest[digest] = file_path
             uploaded_paths.append(file_path)
         
         # Generate output filename
         output_filename = f"merged_{uuid.uuid4()}.pdf"
         output_path = os.path.join(OUTPUT_FOLDER, output_filename)
+        register_file(output_path)
         
         # Get and validate page ranges if provided
         page_ranges_str = request.form.get('page_ranges', '').strip()
@@ -157,7 +390,7 @@ def api_merge_pdfs():
         # Merge PDFs with error handling
         @ErrorHandler.handle_processing_error
         def perform_merge():
-            return pdf_merger.merge_pdfs(uploaded_paths, output_path, page_ranges)
+            return get_pdf_merger().merge_pdfs(uploaded_paths, output_path, page_ranges)
         
         result = perform_merge()
         if isinstance(result, dict) and not result.get('success', True):
@@ -192,17 +425,18 @@ def api_split_pdf():
             return jsonify({'success': False, 'error': 'No file uploaded'})
         
         file = request.files['file']
-        if not file or not allowed_file(file.filename) or not file.filename.lower().endswith('.pdf'):
+        if not is_pdf_upload(file):
             return jsonify({'success': False, 'error': 'Please upload a valid PDF file'})
         
         # Save uploaded file
-        filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
+        filename = secure_filename(f"{new_internal_id()}_{file.filename}")
         file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
+        save_upload(file, file_path)
         
         # Create output directory for split files
-        output_dir = os.path.join(OUTPUT_FOLDER, f"split_{uuid.uuid4()}")
+        output_dir = os.path.join(OUTPUT_FOLDER, f"split_{new_internal_id()}")
         os.makedirs(output_dir, exist_ok=True)
+        register_file(output_dir)
         
         # Get split options
         split_type = request.form.get('split_type', 'pages')
@@ -210,7 +444,7 @@ def api_split_pdf():
         if split_type == 'pages':
             # Split by page count
             pages_per_file = int(request.form.get('pages_per_file', 1))
-            created_files = pdf_splitter.split_by_page_count(file_path, output_dir, pages_per_file)
+            created_files = get_pdf_splitter().split_by_page_count(file_path, output_dir, pages_per_file)
         elif split_type == 'ranges':
             # Split by custom ranges
             ranges_str = request.form.get('page_ranges', '')
@@ -218,30 +452,22 @@ def api_split_pdf():
                 return jsonify({'success': False, 'error': 'Page ranges required'})
             
             # Parse ranges
-            split_ranges = []
-            for i, range_str in enumerate(ranges_str.split(',')):
-                range_str = range_str.strip()
-                if '-' in range_str:
-                    start, end = map(int, range_str.split('-'))
-                    split_ranges.append({'start': start, 'end': end, 'name': f'range_{i+1}'})
-                else:
-                    page = int(range_str)
-                    split_ranges.append({'start': page, 'end': page, 'name': f'page_{page}'})
+            split_ranges = [
+                {'start': start, 'end': end, 'name': f'range_{i+1}' if is_range else f'page_{start}'}
+                for i, (start, end, is_range) in enumerate(parse_page_ranges(ranges_str))
+            ]
             
-            created_files = pdf_splitter.split_pdf(file_path, output_dir, split_ranges)
+            created_files = get_pdf_splitter().split_pdf(file_path, output_dir, split_ranges)
         else:
             # Split into individual pages
-            created_files = pdf_splitter.split_pdf(file_path, output_dir)
+            created_files = get_pdf_splitter().split_pdf(file_path, output_dir)
         
         if created_files:
             # Create a zip file with all split PDFs
-            import zipfile
             zip_filename = f"split_pdfs_{uuid.uuid4()}.zip"
             zip_path = os.path.join(OUTPUT_FOLDER, zip_filename)
-            
-            with zipfile.ZipFile(zip_path, 'w') as zipf:
-                for pdf_file in created_files:
-                    zipf.write(pdf_file, os.path.basename(pdf_file))
+            register_file(zip_path)
+            write_zip(zip_path, created_files)
             
             return jsonify({
                 'success': True,
@@ -264,23 +490,24 @@ def api_compress_pdf():
             return jsonify({'success': False, 'error': 'No file uploaded'})
         
         file = request.files['file']
-        if not file or not allowed_file(file.filename) or not file.filename.lower().endswith('.pdf'):
+        if not is_pdf_upload(file):
             return jsonify({'success': False, 'error': 'Please upload a valid PDF file'})
         
         # Save uploaded file
-        filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
+        filename = secure_filename(f"{new_internal_id()}_{file.filename}")
         file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
+        save_upload(file, file_path)
         
         # Generate output filename
         output_filename = f"compressed_{uuid.uuid4()}.pdf"
         output_path = os.path.join(OUTPUT_FOLDER, output_filename)
+        register_file(output_path)
         
         # Get compression level
         compression_level = request.form.get('compression_level', 'medium')
         
         # Compress PDF
-        result = pdf_compressor.compress_pdf(file_path, output_path, compression_level)
+        result = get_pdf_compressor().compress_pdf(file_path, output_path, compression_level)
         
         if result['success']:
             result['download_url'] = f'/download/{output_filename}'
@@ -313,9 +540,9 @@ def api_convert_files():
                 if file and allowed_file(file.filename):
                     ext = file.filename.rsplit('.', 1)[1].lower()
                     if ext in ['png', 'jpg', 'jpeg', 'bmp', 'tiff', 'gif']:
-                        filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
+                        filename = secure_filename(f"{new_internal_id()}_{file.filename}")
                         file_path = os.path.join(UPLOAD_FOLDER, filename)
-                        file.save(file_path)
+                        save_upload(file, file_path)
                         uploaded_paths.append(file_path)
             
             if not uploaded_paths:
@@ -324,9 +551,10 @@ def api_convert_files():
             # Generate output filename
             output_filename = f"converted_{uuid.uuid4()}.pdf"
             output_path = os.path.join(OUTPUT_FOLDER, output_filename)
+            register_file(output_path)
             
             # Convert images to PDF
-            result = pdf_converter.images_to_pdf(uploaded_paths, output_path)
+            result = get_pdf_converter().images_to_pdf(uploaded_paths, output_path)
             
             if result['success']:
                 result['download_url'] = f'/download/{output_filename}'
@@ -340,34 +568,31 @@ def api_convert_files():
                 return jsonify({'success': False, 'error': 'No file uploaded'})
             
             file = request.files['file']
-            if not file or not file.filename.lower().endswith('.pdf'):
+            if not is_pdf_upload(file):
                 return jsonify({'success': False, 'error': 'Please upload a valid PDF file'})
             
             # Save uploaded file
-            filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
+            filename = secure_filename(f"{new_internal_id()}_{file.filename}")
             file_path = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(file_path)
+            save_upload(file, file_path)
             
             # Create output directory
-            output_dir = os.path.join(OUTPUT_FOLDER, f"images_{uuid.uuid4()}")
+            output_dir = os.path.join(OUTPUT_FOLDER, f"images_{new_internal_id()}")
+            register_file(output_dir)
             
             # Get conversion options
             image_format = request.form.get('image_format', 'PNG')
             dpi = int(request.form.get('dpi', 200))
             
             # Convert PDF to images
-            result = pdf_converter.pdf_to_images(file_path, output_dir, image_format, dpi)
+            result = get_pdf_converter().pdf_to_images(file_path, output_dir, image_format, dpi)
             
             if result['success']:
                 # Create a ZIP file of the converted images
-                import zipfile
                 zip_filename = f"images_{uuid.uuid4()}.zip"
                 zip_path = os.path.join(OUTPUT_FOLDER, zip_filename)
-                
-                with zipfile.ZipFile(zip_path, 'w') as zipf:
-                    for image_file in result['output_files']:
-                        # Add file to zip with just the filename (not full path)
-                        zipf.write(image_file, os.path.basename(image_file))
+                register_file(zip_path)
+                write_zip(zip_path, result['output_files'])
                 
                 # Update result with frontend-expected fields
                 result['pages_converted'] = result.get('page_count', 0)
@@ -394,27 +619,28 @@ def api_unlock_pdf():
             return jsonify({'success': False, 'error': 'No file uploaded'})
         
         file = request.files['file']
-        if not file or not allowed_file(file.filename) or not file.filename.lower().endswith('.pdf'):
+        if not is_pdf_upload(file):
             return jsonify({'success': False, 'error': 'Please upload a valid PDF file'})
         
         # Save uploaded file
-        filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
+        filename = secure_filename(f"{new_internal_id()}_{file.filename}")
         file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
+        save_upload(file, file_path)
         
         # Generate output filename
         output_filename = f"unlocked_{uuid.uuid4()}.pdf"
         output_path = os.path.join(OUTPUT_FOLDER, output_filename)
+        register_file(output_path)
         
         # Get password
         password = request.form.get('password', '')
         
         if password:
             # Try with provided password
-            result = pdf_unlocker.unlock_pdf(file_path, output_path, password)
+            result = get_pdf_unlocker().unlock_pdf(file_path, output_path, password)
         else:
             # Try common passwords
-            result = pdf_unlocker.try_common_passwords(file_path, output_path)
+            result = get_pdf_unlocker().try_common_passwords(file_path, output_path)
         
         if result['success']:
             result['download_url'] = f'/download/{output_filename}'
@@ -430,12 +656,16 @@ def api_unlock_pdf():
 @app.route('/download/<filename>')
 def download_file(filename):
     """Download processed files."""
+    if secure_filename(filename) != filename:
+        return jsonify({'error': 'File not found'}), 404
+    
     try:
-        file_path = os.path.join(OUTPUT_FOLDER, filename)
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
-        else:
-            return jsonify({'error': 'File not found'}), 404
+        # Output names embed a uuid4, so the name is a stable strong ETag;
+        # conditional responses let clients resume or revalidate cheaply
+        return send_file(os.path.join(OUTPUT_FOLDER, filename), as_attachment=True,
+                         conditional=True, etag=filename, max_age=0)
+    except (FileNotFoundError, IsADirectoryError):
+        return jsonify({'error': 'File not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -448,17 +678,24 @@ def api_pdf_info():
             return jsonify({'success': False, 'error': 'No file uploaded'})
         
         file = request.files['file']
-        if not file or not file.filename.lower().endswith('.pdf'):
+        if not is_pdf_upload(file):
             return jsonify({'success': False, 'error': 'Please upload a valid PDF file'})
         
         # Save uploaded file temporarily
-        filename = secure_filename(f"temp_{uuid.uuid4()}_{file.filename}")
+        filename = secure_filename(f"temp_{new_internal_id()}_{file.filename}")
         file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
+        digest = save_upload(file, file_path)
+        
+        # Same content inspected recently: skip parsing it again
+        cached_info = get_cached_pdf_info(digest)
+        if cached_info is not None:
+            os.remove(file_path)
+            return jsonify({'success': True, 'info': cached_info})
         
-        # Get PDF info
-        info = pdf_merger.get_pdf_info(file_path)
-        encryption_info = pdf_unlocker.check_pdf_encryption(file_path)
+        # Get PDF info; pages and metadata come from the merger's parse, so the
+        # encryption check only needs to scan the trailers
+        info = get_pdf_merger().get_pdf_info(file_path)
+        encryption_info = get_pdf_unlocker().check_pdf_encryption(file_path, detailed=False)
         
         # Combine information
         combined_info = {**info, **encryption_info}
@@ -466,6 +703,9 @@ def api_pdf_info():
         # Clean up temp file
         os.remove(file_path)
         
+        if 'error' not in info:
+            cache_pdf_info(digest, combined_info)
+        
         return jsonify({'success': True, 'info': combined_info})
     
     except Exception as e:
@@ -518,10 +758,17 @@ def handle_exception(e):
 
 
 def find_free_port(start_port=5000, max_port=5010):
-    """Find a free port starting from start_port."""
+    """Find a free port starting from start_port (0 lets the OS pick one)."""
     import socket
+    if start_port == 0:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind(('localhost', 0))
+            return s.getsockname()[1]
+    
     for port in range(start_port, max_port + 1):
         try:
+            # A plain bind: SO_REUSEADDR would let the probe succeed on a port
+            # that is in use on Windows, or held on the wildcard address on macOS
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.bind(('localhost', port))
                 return port
@@ -531,9 +778,8 @@ def find_free_port(start_port=5000, max_port=5010):
 
 
 if __name__ == '__main__':
-    # Ensure directories exist
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    # Ensure directories exist (no-op if done at import)
+    ensure_directories()
     
     # Find available port (check environment variable first)
     env_port = os.environ.get('PORT')
@@ -568,7 +814,7 @@ if __name__ == '__main__':
     print(f"📱 Also accessible at http://0.0.0.0:{port}")
     
     try:
-        app.run(debug=True, host='0.0.0.0', port=port)
+        app.run(debug=True, host='0.0.0.0', port=port, threaded=True)
     except KeyboardInterrupt:
         print(f"\n👋 PyPDF Toolkit Web stopped gracefully")
     except Exception as e:
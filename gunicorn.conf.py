@@ -0,0 +1,19 @@
+"""
+Gunicorn configuration for PyPDF Toolkit Web
+Runs threaded workers so uploads, downloads and PDF processing from
+different requests overlap instead of queueing behind one another.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Threaded workers: blocking file I/O and Ghostscript/poppler subprocesses
+# release the GIL, so other requests keep being served in the meantime
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Large PDFs can take a while to compress or rasterize
+timeout = 120
@@ -0,0 +1,75 @@
+"""
+Buffer Pool Module
+Provides reusable, page-aligned I/O buffers for streaming file copies.
+"""
+
+import mmap
+import queue
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class BufferPool:
+    """Pool of fixed-size anonymous mmap buffers shared across requests."""
+    
+    def __init__(self, size: int = 1024 * 1024, count: int = 8):
+        """
+        Create a buffer pool.
+        
+        Args:
+            size: Size of each buffer in bytes (rounded up to the page size)
+            count: Maximum number of idle buffers kept for reuse
+        """
+        self.size = -(-size // mmap.PAGESIZE) * mmap.PAGESIZE
+        self.count = count
+        self._idle = queue.LifoQueue(maxsize=count)
+    
+    def acquire(self) -> mmap.mmap:
+        """Take a buffer from the pool, allocating a new one if none is idle."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            # Anonymous mappings are page-aligned and zero-filled lazily by the kernel
+            return mmap.mmap(-1, self.size)
+    
+    def release(self, buffer: mmap.mmap) -> None:
+        """Return a buffer to the pool, or free it if the pool is full."""
+        try:
+            self._idle.put_nowait(buffer)
+        except queue.Full:
+            buffer.close()
+    
+    @contextmanager
+    def buffer(self) -> Iterator[mmap.mmap]:
+        """Context manager that acquires a buffer and releases it afterwards."""
+        buffer = self.acquire()
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+
+def copy_stream(src, dst, pool: BufferPool, digest=None) -> int:
+    """
+    Copy a readable binary stream into a writable one using a pooled buffer.
+    
+    Args:
+        src: Source stream supporting readinto()
+        dst: Destination stream
+        pool: Buffer pool to borrow the copy buffer from
+        digest: Optional hashlib object updated with every chunk copied
+    
+    Returns:
+        Number of bytes copied
+    """
+    copied = 0
+    with pool.buffer() as buffer, memoryview(buffer) as view:
+        while True:
+            read = src.readinto(view)
+            if not read:
+                break
+            dst.write(view[:read])
+            if digest is not None:
+                digest.update(view[:read])
+            copied += read
+    return copied
@@ -4,34 +4,169 @@ Provides comprehensive error handling and validation for the PyPDF Toolkit Web a
 """
 
 import os
+import re
+import queue
+import atexit
 import logging
-import traceback
-from functools import wraps
+import logging.handlers
+from functools import wraps, lru_cache, partial
+from itertools import compress
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List
 from werkzeug.utils import secure_filename
 
 
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_BUFFER_SIZE = 64 * 1024
+
+
+class _BufferedFileHandler(logging.FileHandler):
+    """File handler that writes through a large buffer and flushes once the log queue drains."""
+    
+    def __init__(self, filename: str, log_queue: queue.Queue, buffer_size: int = LOG_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.log_queue = log_queue
+        super().__init__(filename)
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=getattr(self, 'errors', None))
+    
+    def flush(self):
+        # Batch writes while a burst of records is still queued
+        if self.log_queue.empty():
+            super().flush()
+
+
+def _configure_logging() -> Optional[logging.handlers.QueueListener]:
+    """
+    Route log records through a queue so request threads never block on disk I/O.
+    
+    Returns:
+        The started QueueListener, or None if logging was already configured
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    
+    log_queue = queue.Queue(-1)
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = _BufferedFileHandler('app.log', log_queue)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+_log_listener = _configure_logging()
 
 logger = logging.getLogger(__name__)
 
+# Shared, bounded pool for probing the files of a multi-file upload
+_validation_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='upload-validation')
+
+# Leading magic bytes for each accepted upload type
+MIME_SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'BM', 'image/bmp'),
+)
+MIME_SNIFF_BYTES = 16
+
+# One comma-separated page token: a range, a single page, or anything else (invalid)
+_PAGE_TOKEN_RE = re.compile(r'\s*(?:(\d+)\s*-\s*(\d+)|(\d+)|([^,]*?))\s*(?:,|\Z)')
+
+
+def _file_size(file) -> int:
+    """
+    Determine an upload's size without reading its contents.
+    
+    Args:
+        file: Werkzeug FileStorage object
+    
+    Returns:
+        Size of the upload in bytes
+    """
+    if file.content_length:
+        return file.content_length
+    
+    stream = getattr(file, 'stream', file)
+    if hasattr(stream, 'getbuffer'):
+        # In-memory upload (small files are spooled into a BytesIO)
+        return stream.getbuffer().nbytes
+    
+    try:
+        return os.fstat(stream.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        # Fallback: seek to end to get size
+        file.seek(0, 2)
+        size = file.tell()
+        file.seek(0)
+        return size
+
+
+@lru_cache(maxsize=1024)
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """
+    Detect a file's MIME type from its leading bytes.
+    
+    Args:
+        head: First bytes of the file (MIME_SNIFF_BYTES is enough)
+    
+    Returns:
+        Detected MIME type, or None if the signature is not recognised
+    """
+    for signature, mime_type in MIME_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+# Message templates for errors raised with details instead of a preformatted message
+ERROR_MESSAGES = {
+    'INVALID_EXTENSION': "File extension '{extension}' not allowed. Allowed: {allowed}",
+    'FILE_TOO_LARGE': "File size ({size} bytes) exceeds maximum allowed size ({max_size} bytes)",
+    'SECURITY_VIOLATION': "Dangerous pattern detected in filename: {pattern}",
+    'TOO_MANY_FILES': "Too many files ({count}). Maximum allowed: {max_files}",
+    'TOTAL_SIZE_TOO_LARGE': "Total file size ({size} bytes) too large",
+    'INVALID_PAGE_RANGE': "Invalid page range format: {part}",
+    'INVALID_PAGE_NUMBER': "Invalid page number: {part}",
+}
+
 
 class PDFToolkitError(Exception):
     """Base exception class for PDF Toolkit errors."""
     
-    def __init__(self, message: str, error_code: str = None, details: Dict = None):
-        self.message = message
+    def __init__(self, message: str = None, error_code: str = None, details: Dict = None):
+        self._message = message
         self.error_code = error_code or 'UNKNOWN_ERROR'
         self.details = details or {}
-        super().__init__(self.message)
+        super().__init__(message)
+    
+    @property
+    def message(self) -> str:
+        """Error message, formatted from ERROR_MESSAGES on first access if none was given."""
+        if self._message is None:
+            self._message = ERROR_MESSAGES.get(self.error_code, self.error_code).format(**self.details)
+        return self._message
+    
+    def __str__(self) -> str:
+        return self.message
 
 
 class FileValidationError(PDFToolkitError):
@@ -55,12 +190,13 @@ class ErrorHandler:
     # File validation constants
     MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
     MAX_FILES_PER_REQUEST = 10
-    ALLOWED_PDF_EXTENSIONS = {'.pdf'}
-    ALLOWED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif'}
-    ALLOWED_MIME_TYPES = {
+    ALLOWED_PDF_EXTENSIONS = frozenset({'.pdf'})
+    ALLOWED_IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif'})
+    ALLOWED_EXTENSIONS = ALLOWED_PDF_EXTENSIONS | ALLOWED_IMAGE_EXTENSIONS
+    ALLOWED_MIME_TYPES = frozenset({
         'application/pdf',
         'image/jpeg', 'image/png', 'image/bmp', 'image/tiff', 'image/gif'
-    }
+    })
     
     # Security patterns to check
     DANGEROUS_PATTERNS = [
@@ -68,8 +204,11 @@ class ErrorHandler:
         '<script', 'javascript:', 'data:', 'vbscript:', 'onload=', 'onerror='
     ]
     
+    # All patterns folded into one alternation so a filename is scanned in a single pass
+    DANGEROUS_PATTERN_RE = re.compile('|'.join(map(re.escape, DANGEROUS_PATTERNS)))
+    
     @staticmethod
-    def validate_file_upload(file, allowed_extensions: set = None, max_size: int = None) -> Dict[str, Any]:
+    def validate_file_upload(file, allowed_extensions: frozenset = None, max_size: int = None) -> Dict[str, Any]:
         """
         Validate uploaded file for security and format compliance.
         
@@ -89,49 +228,51 @@ class ErrorHandler:
             if not filename:
                 raise FileValidationError("Invalid filename", "INVALID_FILENAME")
             
+            # Lowercase once for both the extension and dangerous pattern checks
+            filename_lower = filename.lower()
+            
             # Check file extension
-            file_ext = os.path.splitext(filename)[1].lower()
+            _, dot, ext = filename_lower.rpartition('.')
+            file_ext = '.' + ext if dot else ''
             if allowed_extensions and file_ext not in allowed_extensions:
-                raise FileValidationError(
-                    f"File extension '{file_ext}' not allowed. Allowed: {', '.join(allowed_extensions)}",
-                    "INVALID_EXTENSION"
-                )
+                raise FileValidationError(error_code="INVALID_EXTENSION", details={
+                    'extension': file_ext, 'allowed': ', '.join(allowed_extensions)
+                })
             
             # Check file size
             max_size = max_size or ErrorHandler.MAX_FILE_SIZE
-            if hasattr(file, 'content_length') and file.content_length:
-                file_size = file.content_length
-            else:
-                # Fallback: seek to end to get size
-                file.seek(0, 2)
-                file_size = file.tell()
-                file.seek(0)
+            file_size = _file_size(file)
             
             if file_size > max_size:
-                raise FileValidationError(
-                    f"File size ({file_size} bytes) exceeds maximum allowed size ({max_size} bytes)",
-                    "FILE_TOO_LARGE"
-                )
+                raise FileValidationError(error_code="FILE_TOO_LARGE", details={
+                    'size': file_size, 'max_size': max_size
+                })
             
             # Check for dangerous patterns in filename
-            for pattern in ErrorHandler.DANGEROUS_PATTERNS:
-                if pattern in filename.lower():
-                    raise SecurityError(f"Dangerous pattern detected in filename: {pattern}", "SECURITY_VIOLATION")
+            match = ErrorHandler.DANGEROUS_PATTERN_RE.search(filename_lower)
+            if match:
+                raise SecurityError(error_code="SECURITY_VIOLATION", details={'pattern': match.group()})
             
-            # Validate MIME type if available
-            if hasattr(file, 'mimetype') and file.mimetype:
-                if file.mimetype not in ErrorHandler.ALLOWED_MIME_TYPES:
-                    logger.warning(f"Suspicious MIME type: {file.mimetype} for file: {filename}")
+            # Sniff the real content type from the leading bytes rather than trusting the client
+            file.seek(0)
+            mime_type = sniff_mime_type(file.read(MIME_SNIFF_BYTES))
+            file.seek(0)
+            if mime_type not in ErrorHandler.ALLOWED_MIME_TYPES:
+                logger.warning("Suspicious content for file: %s (client MIME type: %s)", filename, file.mimetype)
             
             return {
                 'valid': True,
                 'filename': filename,
                 'size': file_size,
-                'extension': file_ext
+                'extension': file_ext,
+                'mime_type': mime_type
             }
             
         except (FileValidationError, SecurityError) as e:
-            logger.error(f"File validation error: {e.message}")
+            # Expected rejections are logged once, by create_error_response at the API boundary;
+            # only security violations are recorded here for auditing
+            if isinstance(e, SecurityError):
+                logger.warning("Security violation in upload: %s", e.message)
             return {
                 'valid': False,
                 'error': e.message,
@@ -146,7 +287,7 @@ class ErrorHandler:
             }
     
     @staticmethod
-    def validate_multiple_files(files: List, allowed_extensions: set = None, max_files: int = None) -> Dict[str, Any]:
+    def validate_multiple_files(files: List, allowed_extensions: frozenset = None, max_files: int = None) -> Dict[str, Any]:
         """
         Validate multiple file uploads.
         
@@ -164,18 +305,24 @@ class ErrorHandler:
             
             max_files = max_files or ErrorHandler.MAX_FILES_PER_REQUEST
             if len(files) > max_files:
-                raise FileValidationError(
-                    f"Too many files ({len(files)}). Maximum allowed: {max_files}",
-                    "TOO_MANY_FILES"
-                )
+                raise FileValidationError(error_code="TOO_MANY_FILES", details={
+                    'count': len(files), 'max_files': max_files
+                })
             
             valid_files = []
             errors = []
             total_size = 0
+            max_total_size = ErrorHandler.MAX_FILE_SIZE * 2  # Allow double for multiple files
             
-            for i, file in enumerate(files):
-                validation = ErrorHandler.validate_file_upload(file, allowed_extensions)
-                
+            # Probe the uploads concurrently; each one is an independent stream
+            if len(files) > 1:
+                validations = _validation_pool.map(
+                    partial(ErrorHandler.validate_file_upload, allowed_extensions=allowed_extensions), files
+                )
+            else:
+                validations = [ErrorHandler.validate_file_upload(files[0], allowed_extensions)]
+            
+            for i, (file, validation) in enumerate(zip(files, validations)):
                 if validation['valid']:
                     valid_files.append({
                         'file': file,
@@ -184,16 +331,13 @@ class ErrorHandler:
                         'extension': validation['extension']
                     })
                     total_size += validation['size']
+                    
+                    # Check total size
+                    if total_size > max_total_size:
+                        raise FileValidationError(error_code="TOTAL_SIZE_TOO_LARGE", details={'size': total_size})
                 else:
                     errors.append(f"File {i+1}: {validation['error']}")
             
-            # Check total size
-            if total_size > ErrorHandler.MAX_FILE_SIZE * 2:  # Allow double for multiple files
-                raise FileValidationError(
-                    f"Total file size ({total_size} bytes) too large",
-                    "TOTAL_SIZE_TOO_LARGE"
-                )
-            
             return {
                 'valid': len(valid_files) > 0,
                 'valid_files': valid_files,
@@ -202,7 +346,6 @@ class ErrorHandler:
             }
             
         except FileValidationError as e:
-            logger.error(f"Multiple file validation error: {e.message}")
             return {
                 'valid': False,
                 'valid_files': [],
@@ -234,40 +377,36 @@ class ErrorHandler:
             if not page_range or page_range.strip().lower() == 'all':
                 return {'valid': True, 'pages': list(range(1, total_pages + 1))}
             
-            pages = set()
-            parts = page_range.split(',')
+            # Mark selected pages in a bitmap; index 0 is unused
+            mask = bytearray(total_pages + 1)
             
-            for part in parts:
-                part = part.strip()
-                if not part:
-                    continue
+            for match in _PAGE_TOKEN_RE.finditer(page_range):
+                start, end, single, invalid = match.groups()
                 
-                if '-' in part:
+                if start is not None:
                     # Handle range like "1-5"
-                    try:
-                        start, end = map(int, part.split('-', 1))
-                        if start < 1 or end > total_pages or start > end:
-                            raise ValueError(f"Invalid range: {part}")
-                        pages.update(range(start, end + 1))
-                    except ValueError:
-                        raise FileValidationError(f"Invalid page range format: {part}", "INVALID_PAGE_RANGE")
-                else:
+                    start, end = int(start), int(end)
+                    if start < 1 or end > total_pages or start > end:
+                        raise FileValidationError(error_code="INVALID_PAGE_RANGE", details={'part': match.group().strip(' ,')})
+                    mask[start:end + 1] = b'\x01' * (end - start + 1)
+                elif single is not None:
                     # Handle single page like "5"
-                    try:
-                        page = int(part)
-                        if page < 1 or page > total_pages:
-                            raise ValueError(f"Page {page} out of range")
-                        pages.add(page)
-                    except ValueError:
-                        raise FileValidationError(f"Invalid page number: {part}", "INVALID_PAGE_NUMBER")
+                    page = int(single)
+                    if page < 1 or page > total_pages:
+                        raise FileValidationError(error_code="INVALID_PAGE_NUMBER", details={'part': single})
+                    mask[page] = 1
+                elif invalid:
+                    if '-' in invalid:
+                        raise FileValidationError(error_code="INVALID_PAGE_RANGE", details={'part': invalid})
+                    raise FileValidationError(error_code="INVALID_PAGE_NUMBER", details={'part': invalid})
             
+            pages = list(compress(range(total_pages + 1), mask))
             if not pages:
                 raise FileValidationError("No valid pages specified", "NO_PAGES")
             
-            return {'valid': True, 'pages': sorted(list(pages))}
+            return {'valid': True, 'pages': pages}
             
         except FileValidationError as e:
-            logger.error(f"Page range validation error: {e.message}")
             return {'valid': False, 'error': e.message, 'error_code': e.error_code}
         except Exception as e:
             logger.error(f"Unexpected error during page range validation: {str(e)}")
@@ -301,8 +440,8 @@ class ErrorHandler:
                 logger.error(f"Processing error in {func.__name__}: {e.message}")
                 return {'success': False, 'error': e.message, 'error_code': e.error_code}
             except Exception as e:
-                logger.error(f"Unexpected error in {func.__name__}: {str(e)}")
-                logger.error(f"Traceback: {traceback.format_exc()}")
+                # exception() attaches exc_info; the traceback is only formatted if a handler emits it
+                logger.exception("Unexpected error in %s: %s", func.__name__, e)
                 return {'success': False, 'error': 'Processing failed', 'error_code': 'PROCESSING_ERROR'}
         
         return wrapper
@@ -322,18 +461,21 @@ class ErrorHandler:
         filename = secure_filename(filename)
         
         # Remove any remaining dangerous patterns
-        for pattern in ErrorHandler.DANGEROUS_PATTERNS:
-            filename = filename.replace(pattern, '')
+        filename = ErrorHandler.DANGEROUS_PATTERN_RE.sub('', filename)
         
         # Ensure filename is not empty and has reasonable length
         if not filename:
-            filename = 'unnamed_file'
+            return 'unnamed_file'
         
-        if len(filename) > 255:
-            name, ext = os.path.splitext(filename)
-            filename = name[:255-len(ext)] + ext
+        if len(filename) <= 255:
+            return filename
         
-        return filename
+        # Keep the extension when truncating overlong names
+        name, dot, ext = filename.rpartition('.')
+        if not dot or not name:
+            return filename[:255]
+        ext = dot + ext
+        return name[:255-len(ext)] + ext
     
     @staticmethod
     def create_error_response(error_message: str, error_code: str = None, status_code: int = 400) -> tuple:
@@ -367,8 +509,11 @@ class ErrorHandler:
             operation: Operation name
             details: Additional details to log
         """
-        log_message = f"Operation: {operation}"
-        if details:
-            log_message += f" | Details: {details}"
+        if not logger.isEnabledFor(logging.INFO):
+            return
         
-        logger.info(log_message)
+        # Let the logging framework format the message only when it is emitted
+        if details:
+            logger.info("Operation: %s | Details: %s", operation, details)
+        else:
+            logger.info("Operation: %s", operation)
@@ -4,15 +4,561 @@ Handles PDF file compression to reduce file size.
 """
 
 import os
+import sys
+import math
+import mmap
+import shutil
+import logging
 import subprocess
+import multiprocessing
 import tempfile
+from io import BytesIO
+from PIL import Image
 from pypdf import PdfWriter, PdfReader
-from typing import Optional, Dict
+from pypdf.generic import (DecodedStreamObject, EncodedStreamObject, IndirectObject, NameObject,
+                           NullObject, NumberObject, create_string_object)
+from functools import lru_cache, partial
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Dict, Iterator, Tuple
+
+try:
+    import fcntl  # POSIX only; used for copy-on-write file clones
+except ImportError:
+    fcntl = None
+
+try:
+    import deflate  # libdeflate bindings: tighter and faster than zlib at the same level
+except ImportError:
+    deflate = None
+
+try:
+    import pyvips  # libvips: streaming, low-memory JPEG resampling for large scans
+except (ImportError, OSError):
+    pyvips = None
+
+try:
+    import zopfli.zlib as zopfli_zlib  # exhaustive Deflate encoder for the archival tier
+except ImportError:
+    zopfli_zlib = None
+
+
+logger = logging.getLogger(__name__)
+
+# zlib level used for content streams at each compression level
+ZLIB_LEVELS = {'low': 1, 'medium': 6, 'high': 9}
+
+# libdeflate levels (1-12) used instead when the deflate package is installed
+LIBDEFLATE_LEVELS = {'low': 1, 'medium': 6, 'high': 12}
+
+# qpdf binary, if installed; used as a fast native lossless compressor
+QPDF_PATH = shutil.which('qpdf')
+
+# Linux ioctl that clones a file's extents copy-on-write (Btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+
+# JPEG downsampling applied to embedded images at the 'high' level
+IMAGE_DOWNSAMPLE_SCALE = 0.66
+IMAGE_JPEG_QUALITY = 75
+
+# Zopfli iterations for the 'max' tier; more iterations give diminishing returns
+ZOPFLI_ITERATIONS = 15
+
+# Ghostscript (PDFSETTINGS preset, image DPI) per compression level
+GS_SETTINGS = {'high': ('printer', 150), 'medium': ('ebook', 200), 'low': ('prepress', 300)}
+
+
+def _build_gs_argv(quality: str, dpi: int) -> list:
+    """Build the Ghostscript pdfwrite argv for one preset, minus the input path."""
+    return [
+        'gs',
+        '-sDEVICE=pdfwrite',
+        '-dCompatibilityLevel=1.4',
+        f'-dPDFSETTINGS=/{quality}',
+        '-dNOPAUSE',
+        '-dQUIET',
+        '-dBATCH',
+        '-dNOPROMPT',
+        '-dOptimize=true',
+        '-dCompressFonts=true',
+        '-dSubsetFonts=true',
+        '-dColorImageDownsampleType=/Bicubic',
+        f'-dColorImageResolution={dpi}',
+        '-dGrayImageDownsampleType=/Bicubic',
+        f'-dGrayImageResolution={dpi}',
+        '-dMonoImageDownsampleType=/Bicubic',
+        f'-dMonoImageResolution={dpi}',
+        '-sOutputFile=-',
+    ]
+
+
+# Ghostscript argv per compression level, built once at import
+GS_ARGV = {level: _build_gs_argv(quality, dpi) for level, (quality, dpi) in GS_SETTINGS.items()}
+
+# Order in which compression methods are tried for each document profile:
+# Ghostscript's image downsampling pays off for scans, stream recompression for
+# text, and vector art is best kept lossless
+COMPRESSION_PLANS = {
+    'image_heavy': ('ghostscript', 'qpdf', 'advanced', 'alternative', 'minimal'),
+    'text_heavy': ('advanced', 'qpdf', 'ghostscript', 'alternative', 'minimal'),
+    'vector_heavy': ('qpdf', 'advanced', 'alternative', 'minimal', 'ghostscript'),
+}
+
+# Content streams sampled when deciding whether a PDF is already tightly compressed
+ENTROPY_SAMPLE_STREAMS = 4
+ENTROPY_SAMPLE_BYTES = 4096
+ENTROPY_THRESHOLD = 7.8  # bits per byte; Deflate output sits just below 8
+
+# Shared pool for CPU-bound per-page work such as zlib compression
+_compress_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+
+@lru_cache(maxsize=None)
+def _zopfli_pool() -> ProcessPoolExecutor:
+    """
+    Return the long-lived process pool for Zopfli recompression, starting it on first use.
+    
+    Workers come from a forkserver (or are spawned where that is unavailable):
+    forking the threaded web server could copy locks held by other request threads.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    return ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=context)
+
+
+def _flate_encode(content, level: int = -1):
+    """Compress one content stream, returning the exception instead of raising it."""
+    if content is None:
+        return None
+    try:
+        if deflate is None:
+            return content.flate_encode(level)
+        
+        # Decode fully and re-encode with libdeflate rather than stacking another filter
+        encoded = EncodedStreamObject()
+        encoded.update({key: value for key, value in content.items()
+                        if key not in ('/Filter', '/DecodeParms', '/Length')})
+        encoded[NameObject('/Filter')] = NameObject('/FlateDecode')
+        encoded._data = deflate.zlib_compress(content.get_data(), level)
+        return encoded
+    except Exception as e:
+        return e
+
+
+def _fast_copy(src: str, dst: str) -> None:
+    """
+    Copy a file, as a copy-on-write clone where the filesystem supports it.
+    
+    A reflink shares the source's extents instead of copying bytes; elsewhere this
+    falls back to shutil.copyfile, which already uses the kernel's zero-copy path.
+    
+    Args:
+        src: Source file path
+        dst: Destination file path
+    """
+    if fcntl is not None and sys.platform.startswith('linux'):
+        with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+                return
+            except OSError:
+                pass  # Not supported here (tmpfs, ext4, cross-device); copy instead
+    
+    shutil.copyfile(src, dst)
+
+
+def _write_pdf(writer: PdfWriter, output_path: str) -> int:
+    """
+    Serialize a writer in memory and store it with a single write.
+    
+    pypdf issues one small write per object token, so the document is built in a
+    BytesIO and handed to the OS in one go instead.
+    
+    Args:
+        writer: Populated PdfWriter
+        output_path: Destination file path
+    
+    Returns:
+        Size of the written file in bytes
+    """
+    buffer = BytesIO()
+    writer.write(buffer)
+    data = buffer.getbuffer()
+    
+    fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        written = 0
+        while written < len(data):
+            written += os.write(fd, data[written:])
+    finally:
+        os.close(fd)
+    
+    return len(data)
+
+
+@contextmanager
+def _mapped_reader(pdf_path: str, **kwargs) -> Iterator[PdfReader]:
+    """
+    Parse a PDF through a read-only memory map instead of reading it into memory.
+    
+    PdfReader copies a file path's whole contents into a BytesIO; a mapping lets
+    it seek around the page cache and only touch the parts it parses. The map is
+    closed on exit, so the reader must not be used afterwards.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        **kwargs: Extra PdfReader arguments
+    
+    Yields:
+        PdfReader backed by the mapped file
+    """
+    with open(pdf_path, 'rb') as pdf_file, \
+            mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield PdfReader(mapped, **kwargs)
+
+
+def _downsample_jpeg(data: bytes, quality: int = IMAGE_JPEG_QUALITY,
+                     scale: float = IMAGE_DOWNSAMPLE_SCALE) -> Optional[Tuple[bytes, int, int]]:
+    """
+    Shrink a greyscale or RGB JPEG by a scale factor and re-encode it.
+    
+    libvips is used when installed, since it decodes sequentially instead of
+    holding the full bitmap; Pillow is the fallback.
+    
+    Args:
+        data: JPEG file bytes
+        quality: JPEG quality of the re-encoded image (1-100)
+        scale: Factor applied to both dimensions; 1 only re-encodes the image
+    
+    Returns:
+        (jpeg_bytes, width, height), or None if the image is not greyscale or RGB
+    """
+    if pyvips is not None:
+        image = pyvips.Image.new_from_buffer(data, '', access='sequential')
+        if image.interpretation not in ('b-w', 'srgb') or image.bands not in (1, 3):
+            return None
+        if scale != 1:
+            image = image.resize(scale, kernel='lanczos3')
+        return (image.jpegsave_buffer(Q=quality, optimize_coding=True, strip=True),
+                image.width, image.height)
+    
+    with Image.open(BytesIO(data)) as img:
+        if img.mode not in ('L', 'RGB'):
+            return None
+        width = max(1, int(img.width * scale))
+        height = max(1, int(img.height * scale))
+        if (width, height) != img.size:
+            img = img.resize((width, height), Image.LANCZOS)
+        buffer = BytesIO()
+        img.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return buffer.getvalue(), width, height
+
+
+def _page_xobjects(page) -> list:
+    """Return the (possibly indirect) XObjects in a page's resource dictionary."""
+    resources = page.get('/Resources')
+    if resources is None:
+        return []
+    xobjects = resources.get_object().get('/XObject')
+    if xobjects is None:
+        return []
+    return list(xobjects.get_object().values())
+
+
+@lru_cache(maxsize=256)
+def _estimate_compression(pdf_path: str, mtime_ns: int, file_size: int) -> Dict:
+    """
+    Compute a compression estimate for one version of a PDF file.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        mtime_ns: Modification time of the file, part of the cache key
+        file_size: Size of the file in bytes, part of the cache key
+    
+    Returns:
+        Dictionary with compression estimates
+    """
+    # Basic estimates based on PDF characteristics; metadata and page count come
+    # from the trailer and page tree root
+    with _mapped_reader(pdf_path, strict=False) as reader:
+        has_metadata = '/Info' in reader.trailer
+        try:
+            page_count = int(reader.trailer['/Root']['/Pages']['/Count'])
+        except (KeyError, TypeError, ValueError):
+            page_count = len(reader.pages)
+        
+        # Stop at the first image XObject instead of walking every page
+        has_images = any(
+            xobject.get_object().get('/Subtype') == '/Image'
+            for page in reader.pages
+            for xobject in _page_xobjects(page)
+        )
+    
+    # Simple heuristic for compression potential
+    estimated_reduction = 0
+    if has_metadata:
+        estimated_reduction += 5  # 5% from metadata removal
+    if page_count > 10:
+        estimated_reduction += 15  # 15% from content compression
+    if has_images:
+        estimated_reduction += 25  # 25% from image compression
+    else:
+        estimated_reduction += 10  # 10% from general compression
+    
+    estimated_reduction = min(estimated_reduction, 60)  # Cap at 60%
+    
+    return {
+        'current_size': file_size,
+        'estimated_reduction_percent': estimated_reduction,
+        'estimated_new_size': int(file_size * (100 - estimated_reduction) / 100),
+        'page_count': page_count,
+        'has_metadata': has_metadata,
+        'has_images': has_images
+    }
+
+
+def _zopfli_compress(data: bytes) -> bytes:
+    """Compress one stream with Zopfli (runs in a worker process)."""
+    return zopfli_zlib.compress(data, numiterations=ZOPFLI_ITERATIONS)
 
 
 class PDFCompressor:
     """Class to handle PDF compression operations."""
     
+    # Ghostscript probe result, shared by all instances once checked
+    _gs_available: Optional[bool] = None
+    _gs_version: Optional[str] = None
+    
+    @classmethod
+    def _check_gs(cls) -> bool:
+        """
+        Check whether Ghostscript is installed, probing it only on the first call.
+        
+        Returns:
+            True if the gs binary runs
+        """
+        if cls._gs_available is None:
+            try:
+                result = subprocess.run(['gs', '--version'], stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True, check=True)
+                cls._gs_version = result.stdout.strip()
+                cls._gs_available = True
+                print(f"Ghostscript {cls._gs_version} is available")
+            except (subprocess.CalledProcessError, FileNotFoundError):
+                cls._gs_available = False
+        return cls._gs_available
+    
+    @staticmethod
+    def _clone_document(input_path: str, reader: Optional[PdfReader] = None) -> PdfWriter:
+        """
+        Copy a PDF into a new writer in a single object-graph pass.
+        
+        Args:
+            input_path: Path to the input PDF file
+            reader: Already-parsed reader for input_path, reused instead of parsing again
+        
+        Returns:
+            PdfWriter holding all pages of the input document
+        """
+        if reader is not None:
+            return PdfWriter(clone_from=reader)
+        # Cloning copies every object, so the mapping can be released straight away
+        with _mapped_reader(input_path) as reader:
+            return PdfWriter(clone_from=reader)
+    
+    @staticmethod
+    def _strip_metadata(writer: PdfWriter) -> None:
+        """
+        Remove the document metadata a cloned writer copied from its source.
+        
+        Cloning copies the source /Info dictionary and XMP packet, which
+        add_metadata({}) leaves in place. /Info is cut back to the /Producer entry
+        of a fresh writer and the catalog's /Metadata stream is dropped; values
+        stored as separate objects are nulled so they are not written as orphans.
+        
+        Args:
+            writer: Writer created by _clone_document
+        """
+        info = writer._info.get_object()
+        orphans = [value for value in info.values() if isinstance(value, IndirectObject)]
+        xmp = writer._root_object.pop(NameObject('/Metadata'), None)
+        if isinstance(xmp, IndirectObject):
+            orphans.append(xmp)
+        for ref in orphans:
+            if ref.pdf is writer:
+                writer._objects[ref.idnum - 1] = NullObject()
+        
+        info.clear()
+        info[NameObject('/Producer')] = create_string_object('pypdf')
+    
+    @staticmethod
+    def _content_streams(page) -> list:
+        """Return the content stream objects of a page, resolving a /Contents array."""
+        contents = page.get('/Contents')
+        if contents is None:
+            return []
+        contents = contents.get_object()
+        if isinstance(contents, list):
+            return [stream.get_object() for stream in contents]
+        return [contents]
+    
+    @staticmethod
+    def _classify_pdf(reader: PdfReader) -> str:
+        """
+        Classify a PDF by what makes up most of its bytes, to pick the compression method to try first.
+        
+        Args:
+            reader: Parsed input document
+        
+        Returns:
+            'image_heavy' if image XObjects outweigh content streams, otherwise
+            'text_heavy' if any page uses fonts, else 'vector_heavy'
+        """
+        image_bytes = 0
+        content_bytes = 0
+        has_fonts = False
+        seen = set()
+        
+        for page in reader.pages:
+            resources = page.get('/Resources')
+            has_fonts = has_fonts or (resources is not None and '/Font' in resources.get_object())
+            
+            for ref in _page_xobjects(page):
+                # Images shared between pages are counted once
+                key = getattr(ref, 'idnum', id(ref))
+                if key in seen:
+                    continue
+                seen.add(key)
+                xobject = ref.get_object()
+                if xobject.get('/Subtype') == '/Image':
+                    image_bytes += len(xobject._data)
+            
+            content_bytes += sum(len(stream._data) for stream in PDFCompressor._content_streams(page))
+        
+        if image_bytes > content_bytes:
+            return 'image_heavy'
+        return 'text_heavy' if has_fonts else 'vector_heavy'
+    
+    @staticmethod
+    def _is_already_optimized(pages) -> bool:
+        """
+        Check whether a PDF's content streams are already Flate-compressed to near-random bytes.
+        
+        Samples the first few content streams; recompressing such streams cannot
+        gain anything, so content stream compression can be skipped.
+        
+        Args:
+            pages: Pages of a PdfReader or PdfWriter
+        
+        Returns:
+            True if every sampled stream is FlateDecode and their average entropy is above the threshold
+        """
+        entropies = []
+        for page in pages:
+            for stream in PDFCompressor._content_streams(page):
+                filters = stream.get('/Filter')
+                filters = filters if isinstance(filters, list) else [filters]
+                if '/FlateDecode' not in filters:
+                    return False
+                
+                sample = stream._data[:ENTROPY_SAMPLE_BYTES]
+                if not sample:
+                    continue
+                counts = Counter(sample).values()
+                entropies.append(-sum(c / len(sample) * math.log2(c / len(sample)) for c in counts))
+                if len(entropies) >= ENTROPY_SAMPLE_STREAMS:
+                    break
+            if len(entropies) >= ENTROPY_SAMPLE_STREAMS:
+                break
+        
+        return bool(entropies) and sum(entropies) / len(entropies) > ENTROPY_THRESHOLD
+    
+    @staticmethod
+    def _compress_content_streams(pages, compression_level: str = 'medium') -> None:
+        """
+        Flate-compress the content streams of many pages in parallel.
+        
+        Content streams are read and installed serially since that touches shared
+        writer state; only the zlib work, which releases the GIL, runs on the pool.
+        Nothing is done when the sampled streams are already dense Deflate output.
+        
+        Args:
+            pages: Pages belonging to a PdfWriter
+            compression_level: Compression level ('low', 'medium', 'high') selecting the zlib level
+        """
+        pages = list(pages)
+        # Dense Deflate output would only gain another Flate layer
+        if PDFCompressor._is_already_optimized(pages):
+            print("Content streams already compressed, leaving them as they are")
+            return
+        
+        contents = [page.get_contents() for page in pages]
+        levels = ZLIB_LEVELS if deflate is None else LIBDEFLATE_LEVELS
+        encode = partial(_flate_encode, level=levels.get(compression_level, 6))
+        
+        failed = 0
+        for i, (page, encoded) in enumerate(zip(pages, _compress_pool.map(encode, contents))):
+            if isinstance(encoded, Exception):
+                failed += 1
+                logger.debug("Content stream compression failed for page %d: %s", i + 1, encoded)
+            elif encoded is not None:
+                page.replace_contents(encoded)
+        
+        print(f"Applied content stream compression to {len(pages) - failed} of {len(pages)} pages")
+    
+    @staticmethod
+    def _downsample_images(pages, quality: int = IMAGE_JPEG_QUALITY,
+                           scale: float = IMAGE_DOWNSAMPLE_SCALE) -> None:
+        """
+        Downsample and re-encode the JPEG images used by the given pages.
+        
+        Images shared by several pages are processed once, and an image is only
+        replaced when the re-encoded JPEG is smaller.
+        
+        Args:
+            pages: Pages belonging to a PdfWriter
+            quality: JPEG quality of the re-encoded images (1-100)
+            scale: Factor applied to image dimensions; 1 keeps the resolution
+        """
+        seen = set()
+        replaced = 0
+        failed = 0
+        
+        for page in pages:
+            try:
+                xobjects = page['/Resources']['/XObject'].get_object()
+            except KeyError:
+                continue
+            
+            for name in xobjects:
+                image = xobjects[name].get_object()
+                if id(image) in seen:
+                    continue
+                seen.add(id(image))
+                
+                if image.get('/Subtype') != '/Image' or image.get('/Filter') != '/DCTDecode':
+                    continue
+                
+                try:
+                    downsampled = _downsample_jpeg(image._data, quality, scale)
+                    # CMYK/Adobe JPEGs may carry inverted channels and are left alone
+                    if downsampled is None:
+                        continue
+                    data, width, height = downsampled
+                    
+                    if len(data) < len(image._data):
+                        image._data = data
+                        image[NameObject('/Width')] = NumberObject(width)
+                        image[NameObject('/Height')] = NumberObject(height)
+                        image.pop('/DecodeParms', None)
+                        replaced += 1
+                except Exception as e:
+                    failed += 1
+                    logger.debug("Image downsampling failed for %s: %s", name, e)
+        
+        print(f"Downsampled {replaced} of {len(seen)} images ({failed} failed)")
+    
     def compress_pdf(self, input_path: str, output_path: str, 
                     compression_level: str = 'medium') -> Dict:
         """
@@ -26,17 +572,15 @@ class PDFCompressor:
         Returns:
             Dictionary with compression results and statistics
         """
+        mapped = ExitStack()
         try:
-            if not os.path.exists(input_path):
-                raise FileNotFoundError(f"PDF file not found: {input_path}")
-            
-            original_size = os.path.getsize(input_path)
+            # A single stat both checks existence and gives the size
+            original_size = os.stat(input_path).st_size
             print(f"Original file size: {original_size:,} bytes")
             
-            # For low compression, just copy the file
+            # For low compression, just copy the file (copyfile uses the kernel's zero-copy path where available)
             if compression_level == 'low':
-                import shutil
-                shutil.copy2(input_path, output_path)
+                _fast_copy(input_path, output_path)
                 return {
                     'success': True,
                     'original_size': original_size,
@@ -45,30 +589,58 @@ class PDFCompressor:
                     'size_reduction': 0
                 }
             
-            # Try Ghostscript compression first (most effective)
-            print(f"Attempting Ghostscript compression with level: {compression_level}")
-            result = self.compress_pdf_ghostscript(input_path, output_path, compression_level)
-            
-            # If Ghostscript fails or doesn't compress well, try advanced method
-            if not result['success'] or result.get('compression_ratio', 0) <= 5:
-                print(f"Ghostscript compression ineffective, trying advanced method...")
-                result = self.compress_pdf_advanced(input_path, output_path, compression_level)
-            
-            # If advanced method also doesn't work well, try alternative method
-            if not result['success'] or result.get('compression_ratio', 0) <= 5:
-                print(f"Advanced compression ineffective, trying alternative method...")
-                result = self.compress_pdf_alternative(input_path, output_path, compression_level)
-            
-            # If alternative method also doesn't work well, try minimal compression
-            if not result['success'] or result.get('compression_ratio', 0) <= 5:
-                print(f"Alternative compression ineffective, trying minimal compression...")
-                result = self.compress_pdf_minimal(input_path, output_path)
+            # Parse once up front; every pypdf-based method in the cascade clones from this reader,
+            # which stays mapped until compression is finished
+            try:
+                reader = mapped.enter_context(_mapped_reader(input_path))
+            except Exception as e:
+                print(f"Could not parse PDF ahead of compression: {e}")
+                reader = None
+            
+            # Archival tier: lossless Zopfli recompression of every Flate stream
+            if compression_level == 'max':
+                result = self.compress_pdf_zopfli(input_path, output_path, original_size=original_size, reader=reader)
+                if result['success'] and result.get('compression_ratio', 0) > 0:
+                    return result
+                print("Zopfli compression ineffective, falling back to high compression...")
+                compression_level = 'high'
+            
+            # Try the method best suited to the document first, falling back through the rest
+            profile = self._classify_pdf(reader) if reader is not None else 'image_heavy'
+            print(f"Document classified as {profile}")
+            
+            methods = {
+                'advanced': partial(self.compress_pdf_advanced, input_path, output_path, compression_level,
+                                    original_size=original_size, reader=reader),
+                'alternative': partial(self.compress_pdf_alternative, input_path, output_path, compression_level,
+                                       original_size=original_size, reader=reader),
+                'minimal': partial(self.compress_pdf_minimal, input_path, output_path,
+                                   original_size=original_size, reader=reader),
+            }
+            # External tools only join the plan when they are installed
+            if self._check_gs():
+                methods['ghostscript'] = partial(self.compress_pdf_ghostscript, input_path, output_path,
+                                                 compression_level, original_size=original_size)
+            if QPDF_PATH:
+                methods['qpdf'] = partial(self.compress_pdf_qpdf, input_path, output_path, compression_level,
+                                          original_size=original_size)
+            
+            result = None
+            for name in COMPRESSION_PLANS[profile]:
+                if name not in methods:
+                    continue
+                if result is not None:
+                    if result['success'] and result.get('compression_ratio', 0) > 5:
+                        break
+                    print(f"Compression ineffective, trying {name} method...")
+                else:
+                    print(f"Attempting {name} compression with level: {compression_level}")
+                result = methods[name]()
             
             # If all compression methods are ineffective, just copy the original file
-            if not result['success'] or result.get('compression_ratio', 0) <= 0:
+            if result is None or not result['success'] or result.get('compression_ratio', 0) <= 0:
                 print(f"All compression methods ineffective, returning original file")
-                import shutil
-                shutil.copy2(input_path, output_path)
+                _fast_copy(input_path, output_path)
                 return {
                     'success': True,
                     'original_size': original_size,
@@ -86,76 +658,32 @@ class PDFCompressor:
                 'success': False,
                 'error': str(e)
             }
+        finally:
+            mapped.close()
     
     def _compress_pdf_primary(self, input_path: str, output_path: str, 
-                             compression_level: str = 'medium') -> Dict:
+                             compression_level: str = 'medium',
+                             original_size: Optional[int] = None) -> Dict:
         """
         Primary PDF compression method using page-level compression.
         """
         try:
-            original_size = os.path.getsize(input_path)
+            if original_size is None:
+                original_size = os.stat(input_path).st_size
             print(f"Primary compression - Original size: {original_size:,} bytes")
             
-            reader = PdfReader(input_path)
-            writer = PdfWriter()
+            writer = self._clone_document(input_path)
             
-            # Copy all pages to writer with compression
-            for i, page in enumerate(reader.pages):
-                try:
-                    # Apply compression based on level
-                    if compression_level == 'high':
-                        # High compression: multiple techniques
-                        try:
-                            page.compress_content_streams()
-                            print(f"Applied content stream compression to page {i+1}")
-                        except Exception as e:
-                            print(f"Content stream compression failed for page {i+1}: {e}")
-                        
-                        # Scale down slightly for high compression
-                        try:
-                            page.scale_by(0.95)  # Less aggressive scaling
-                            print(f"Applied scaling to page {i+1}")
-                        except Exception as e:
-                            print(f"Scaling failed for page {i+1}: {e}")
-                            
-                    elif compression_level == 'medium':
-                        # Medium compression: basic compression
-                        try:
-                            page.compress_content_streams()
-                            print(f"Applied content stream compression to page {i+1}")
-                        except Exception as e:
-                            print(f"Content stream compression failed for page {i+1}: {e}")
-                            
-                    elif compression_level == 'low':
-                        # Low compression: minimal processing
-                        pass
-                    
-                    writer.add_page(page)
-                    
-                except Exception as e:
-                    # If individual page processing fails, add page without compression
-                    print(f"Warning: Could not process page {i+1}, adding without compression: {e}")
-                    writer.add_page(page)
+            # High compression: downsample embedded JPEG images
+            if compression_level == 'high':
+                self._downsample_images(writer.pages)
             
-            # Apply writer-level compression for medium and high
+            # Medium and high compression: compress content streams
             if compression_level in ['medium', 'high']:
-                try:
-                    writer.compress_identical_objects()
-                    print("Applied identical objects compression")
-                except Exception as e:
-                    print(f"Identical objects compression failed: {e}")
-                
-                try:
-                    writer.remove_duplication()
-                    print("Applied duplication removal")
-                except Exception as e:
-                    print(f"Duplication removal failed: {e}")
+                self._compress_content_streams(writer.pages, compression_level)
             
             # Write the compressed PDF
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
-            
-            compressed_size = os.path.getsize(output_path)
+            compressed_size = _write_pdf(writer, output_path)
             print(f"Primary compression - Compressed size: {compressed_size:,} bytes")
             
             # Calculate compression ratio
@@ -181,43 +709,50 @@ class PDFCompressor:
                 'error': str(e)
             }
     
-    def optimize_images_in_pdf(self, input_path: str, output_path: str, 
-                              image_quality: int = 85) -> Dict:
+    def optimize_all(self, input_path: str, output_path: str, compression_level: str = 'medium',
+                     strip_metadata: bool = True, image_quality: int = 85) -> Dict:
         """
-        Optimize images within a PDF to reduce file size.
+        Apply content compression, metadata removal and image optimization in one pass.
+        
+        The document is parsed once and written once, however many transforms are requested.
         
         Args:
             input_path: Path to the input PDF file
             output_path: Path for the optimized PDF file
-            image_quality: Image quality percentage (1-100)
+            compression_level: Compression level ('low' leaves content streams and images untouched,
+                               'medium' re-encodes JPEG images, 'high' also downsamples them)
+            strip_metadata: Whether to drop document metadata
+            image_quality: JPEG quality of re-encoded images (1-100)
         
         Returns:
-            Dictionary with optimization results
+            Dictionary with optimization results and statistics
         """
         try:
-            reader = PdfReader(input_path)
-            writer = PdfWriter()
+            original_size = os.stat(input_path).st_size
+            writer = self._clone_document(input_path)
             
-            for page in reader.pages:
-                # This is a simplified approach - in a full implementation,
-                # you would extract images, compress them, and reinsert them
-                page.compress_content_streams()
-                writer.add_page(page)
+            if compression_level in ['medium', 'high']:
+                # Like the other methods, only 'high' trades image resolution for size
+                scale = IMAGE_DOWNSAMPLE_SCALE if compression_level == 'high' else 1
+                self._downsample_images(writer.pages, image_quality, scale)
+                self._compress_content_streams(writer.pages, compression_level)
             
-            writer.compress_identical_objects()
-            writer.remove_duplication()
+            if strip_metadata:
+                self._strip_metadata(writer)
             
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
+            compressed_size = _write_pdf(writer, output_path)
             
-            original_size = os.path.getsize(input_path)
-            optimized_size = os.path.getsize(output_path)
+            if original_size > 0:
+                compression_ratio = (original_size - compressed_size) / original_size * 100
+            else:
+                compression_ratio = 0
             
             return {
                 'success': True,
                 'original_size': original_size,
-                'optimized_size': optimized_size,
-                'compression_ratio': round((original_size - optimized_size) / original_size * 100, 2)
+                'compressed_size': compressed_size,
+                'compression_ratio': round(compression_ratio, 2),
+                'size_reduction': original_size - compressed_size
             }
             
         except Exception as e:
@@ -226,6 +761,31 @@ class PDFCompressor:
                 'error': str(e)
             }
     
+    def optimize_images_in_pdf(self, input_path: str, output_path: str, 
+                              image_quality: int = 85) -> Dict:
+        """
+        Optimize images within a PDF to reduce file size.
+        
+        Args:
+            input_path: Path to the input PDF file
+            output_path: Path for the optimized PDF file
+            image_quality: Image quality percentage (1-100)
+        
+        Returns:
+            Dictionary with optimization results
+        """
+        result = self.optimize_all(input_path, output_path, 'medium',
+                                   strip_metadata=False, image_quality=image_quality)
+        if not result['success']:
+            return result
+        
+        return {
+            'success': True,
+            'original_size': result['original_size'],
+            'optimized_size': result['compressed_size'],
+            'compression_ratio': result['compression_ratio']
+        }
+    
     def remove_metadata(self, input_path: str, output_path: str) -> Dict:
         """
         Remove metadata from PDF to reduce file size.
@@ -237,38 +797,21 @@ class PDFCompressor:
         Returns:
             Dictionary with cleaning results
         """
-        try:
-            reader = PdfReader(input_path)
-            writer = PdfWriter()
-            
-            # Copy pages without metadata
-            for page in reader.pages:
-                writer.add_page(page)
-            
-            # Don't copy metadata
-            writer.add_metadata({})
-            
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
-            
-            original_size = os.path.getsize(input_path)
-            cleaned_size = os.path.getsize(output_path)
-            
-            return {
-                'success': True,
-                'original_size': original_size,
-                'cleaned_size': cleaned_size,
-                'size_reduction': original_size - cleaned_size
-            }
-            
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e)
-            }
+        result = self.optimize_all(input_path, output_path, 'low', strip_metadata=True)
+        if not result['success']:
+            return result
+        
+        return {
+            'success': True,
+            'original_size': result['original_size'],
+            'cleaned_size': result['compressed_size'],
+            'size_reduction': result['size_reduction']
+        }
     
     def compress_pdf_alternative(self, input_path: str, output_path: str, 
-                               compression_level: str = 'medium') -> Dict:
+                               compression_level: str = 'medium',
+                               original_size: Optional[int] = None,
+                               reader: Optional[PdfReader] = None) -> Dict:
         """
         Alternative PDF compression method using metadata removal and basic optimizations.
         
@@ -276,57 +819,26 @@ class PDFCompressor:
             input_path: Path to the input PDF file
             output_path: Path for the compressed PDF file
             compression_level: Compression level ('low', 'medium', 'high')
+            original_size: Size of the input in bytes, if already known
+            reader: Already-parsed reader for input_path, if available
         
         Returns:
             Dictionary with compression results and statistics
         """
         try:
-            if not os.path.exists(input_path):
-                raise FileNotFoundError(f"PDF file not found: {input_path}")
-            
-            original_size = os.path.getsize(input_path)
+            if original_size is None:
+                original_size = os.stat(input_path).st_size
             print(f"Alternative compression - Original size: {original_size:,} bytes")
             
-            reader = PdfReader(input_path)
-            writer = PdfWriter()
-            
-            # Copy all pages to writer
-            for page in reader.pages:
-                writer.add_page(page)
+            writer = self._clone_document(input_path, reader)
             
-            # Apply different compression techniques based on level
+            # High compression removes metadata; medium and low only rewrite the document structure
             if compression_level == 'high':
-                # High compression: remove metadata and apply optimizations
-                writer.add_metadata({})  # Remove metadata
+                self._strip_metadata(writer)
                 print("Removed metadata")
-                try:
-                    writer.compress_identical_objects()
-                    print("Applied identical objects compression")
-                except Exception as e:
-                    print(f"Identical objects compression failed: {e}")
-                try:
-                    writer.remove_duplication()
-                    print("Applied duplication removal")
-                except Exception as e:
-                    print(f"Duplication removal failed: {e}")
-                    
-            elif compression_level == 'medium':
-                # Medium compression: basic optimizations only
-                try:
-                    writer.compress_identical_objects()
-                    print("Applied identical objects compression")
-                except Exception as e:
-                    print(f"Identical objects compression failed: {e}")
-                    
-            elif compression_level == 'low':
-                # Low compression: minimal processing
-                pass
             
             # Write the compressed PDF
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
-            
-            compressed_size = os.path.getsize(output_path)
+            compressed_size = _write_pdf(writer, output_path)
             print(f"Alternative compression - Compressed size: {compressed_size:,} bytes")
             
             # Calculate compression ratio
@@ -352,40 +864,34 @@ class PDFCompressor:
                 'error': str(e)
             }
     
-    def compress_pdf_minimal(self, input_path: str, output_path: str) -> Dict:
+    def compress_pdf_minimal(self, input_path: str, output_path: str,
+                             original_size: Optional[int] = None,
+                             reader: Optional[PdfReader] = None) -> Dict:
         """
         Minimal compression method that only removes metadata.
         
         Args:
             input_path: Path to the input PDF file
             output_path: Path for the compressed PDF file
+            original_size: Size of the input in bytes, if already known
+            reader: Already-parsed reader for input_path, if available
         
         Returns:
             Dictionary with compression results and statistics
         """
         try:
-            if not os.path.exists(input_path):
-                raise FileNotFoundError(f"PDF file not found: {input_path}")
-            
-            original_size = os.path.getsize(input_path)
+            if original_size is None:
+                original_size = os.stat(input_path).st_size
             print(f"Minimal compression - Original size: {original_size:,} bytes")
             
-            reader = PdfReader(input_path)
-            writer = PdfWriter()
-            
-            # Copy all pages to writer
-            for page in reader.pages:
-                writer.add_page(page)
+            writer = self._clone_document(input_path, reader)
             
             # Only remove metadata - this often provides the best compression
-            writer.add_metadata({})
+            self._strip_metadata(writer)
             print("Removed metadata")
             
             # Write the compressed PDF
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
-            
-            compressed_size = os.path.getsize(output_path)
+            compressed_size = _write_pdf(writer, output_path)
             print(f"Minimal compression - Compressed size: {compressed_size:,} bytes")
             
             # Calculate compression ratio
@@ -412,7 +918,9 @@ class PDFCompressor:
             }
     
     def compress_pdf_advanced(self, input_path: str, output_path: str, 
-                            compression_level: str = 'medium') -> Dict:
+                            compression_level: str = 'medium',
+                            original_size: Optional[int] = None,
+                            reader: Optional[PdfReader] = None) -> Dict:
         """
         Advanced PDF compression using multiple techniques including image optimization.
         
@@ -420,90 +928,31 @@ class PDFCompressor:
             input_path: Path to the input PDF file
             output_path: Path for the compressed PDF file
             compression_level: Compression level ('low', 'medium', 'high')
+            original_size: Size of the input in bytes, if already known
+            reader: Already-parsed reader for input_path, if available
         
         Returns:
             Dictionary with compression results and statistics
         """
         try:
-            if not os.path.exists(input_path):
-                raise FileNotFoundError(f"PDF file not found: {input_path}")
-            
-            original_size = os.path.getsize(input_path)
+            if original_size is None:
+                original_size = os.stat(input_path).st_size
             print(f"Advanced compression - Original size: {original_size:,} bytes")
             
-            reader = PdfReader(input_path)
-            writer = PdfWriter()
-            
-            # Copy all pages with advanced compression
-            for i, page in enumerate(reader.pages):
-                try:
-                    # Apply aggressive compression based on level
-                    if compression_level == 'high':
-                        # High compression: multiple aggressive techniques
-                        try:
-                            page.compress_content_streams()
-                            print(f"Applied content stream compression to page {i+1}")
-                        except Exception as e:
-                            print(f"Content stream compression failed for page {i+1}: {e}")
-                        
-                        # Scale down more aggressively for high compression
-                        try:
-                            page.scale_by(0.85)  # More aggressive scaling
-                            print(f"Applied aggressive scaling to page {i+1}")
-                        except Exception as e:
-                            print(f"Scaling failed for page {i+1}: {e}")
-                            
-                    elif compression_level == 'medium':
-                        # Medium compression: balanced approach
-                        try:
-                            page.compress_content_streams()
-                            print(f"Applied content stream compression to page {i+1}")
-                        except Exception as e:
-                            print(f"Content stream compression failed for page {i+1}: {e}")
-                        
-                        # Light scaling for medium compression
-                        try:
-                            page.scale_by(0.95)
-                            print(f"Applied light scaling to page {i+1}")
-                        except Exception as e:
-                            print(f"Scaling failed for page {i+1}: {e}")
-                            
-                    elif compression_level == 'low':
-                        # Low compression: minimal processing
-                        try:
-                            page.compress_content_streams()
-                            print(f"Applied content stream compression to page {i+1}")
-                        except Exception as e:
-                            print(f"Content stream compression failed for page {i+1}: {e}")
-                    
-                    writer.add_page(page)
-                    
-                except Exception as e:
-                    print(f"Warning: Could not process page {i+1}, adding without compression: {e}")
-                    writer.add_page(page)
+            writer = self._clone_document(input_path, reader)
             
-            # Apply aggressive writer-level compression
-            try:
-                writer.compress_identical_objects()
-                print("Applied identical objects compression")
-            except Exception as e:
-                print(f"Identical objects compression failed: {e}")
+            # High compression: downsample embedded JPEG images
+            if compression_level == 'high':
+                self._downsample_images(writer.pages)
             
-            try:
-                writer.remove_duplication()
-                print("Applied duplication removal")
-            except Exception as e:
-                print(f"Duplication removal failed: {e}")
+            self._compress_content_streams(writer.pages, compression_level)
             
             # Remove all metadata for maximum compression
-            writer.add_metadata({})
+            self._strip_metadata(writer)
             print("Removed all metadata")
             
             # Write the compressed PDF
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
-            
-            compressed_size = os.path.getsize(output_path)
+            compressed_size = _write_pdf(writer, output_path)
             print(f"Advanced compression - Compressed size: {compressed_size:,} bytes")
             
             # Calculate compression ratio
@@ -529,80 +978,198 @@ class PDFCompressor:
                 'error': str(e)
             }
     
+    def compress_pdf_zopfli(self, input_path: str, output_path: str,
+                            original_size: Optional[int] = None,
+                            reader: Optional[PdfReader] = None) -> Dict:
+        """
+        Archival PDF compression that re-encodes every Flate stream with Zopfli.
+        
+        Output stays standard FlateDecode, so readers decode it as usual; only
+        compression time increases. Streams are encoded in parallel by a shared pool
+        of worker processes.
+        
+        Args:
+            input_path: Path to the input PDF file
+            output_path: Path for the compressed PDF file
+            original_size: Size of the input in bytes, if already known
+            reader: Already-parsed reader for input_path, if available
+        
+        Returns:
+            Dictionary with compression results and statistics
+        """
+        try:
+            if zopfli_zlib is None:
+                raise ImportError("zopfli is not installed")
+            
+            if original_size is None:
+                original_size = os.stat(input_path).st_size
+            print(f"Zopfli compression - Original size: {original_size:,} bytes")
+            
+            writer = self._clone_document(input_path, reader)
+            
+            # Unfiltered and plain Flate streams only: predictor parameters would have
+            # to be re-applied, and other filters (e.g. DCT images) are lossy or specialised
+            targets = []
+            for index, obj in enumerate(writer._objects):
+                if isinstance(obj, DecodedStreamObject) and '/Filter' not in obj:
+                    targets.append((index, obj, obj.get_data()))
+                elif (isinstance(obj, EncodedStreamObject) and obj.get('/Filter') == '/FlateDecode'
+                        and '/DecodeParms' not in obj):
+                    try:
+                        targets.append((index, obj, obj.get_data()))
+                    except Exception as e:
+                        logger.debug("Skipping undecodable stream %d: %s", index + 1, e)
+            
+            chunksize = max(1, len(targets) // (4 * (os.cpu_count() or 1)))
+            encoded = _zopfli_pool().map(_zopfli_compress, [data for _, _, data in targets], chunksize=chunksize)
+            for (index, obj, _), data in zip(targets, encoded):
+                if isinstance(obj, EncodedStreamObject):
+                    # Keep whichever encoding is smaller
+                    if len(data) < len(obj._data):
+                        obj._data = data
+                        obj.decoded_self = None
+                else:
+                    stream = EncodedStreamObject()
+                    stream.update({key: value for key, value in obj.items() if key != '/Length'})
+                    stream[NameObject('/Filter')] = NameObject('/FlateDecode')
+                    stream._data = data
+                    writer._objects[index] = stream
+            
+            print(f"Recompressed {len(targets)} streams with Zopfli")
+            
+            compressed_size = _write_pdf(writer, output_path)
+            
+            print(f"Zopfli compression - Compressed size: {compressed_size:,} bytes")
+            
+            # Calculate compression ratio
+            if original_size > 0:
+                compression_ratio = (original_size - compressed_size) / original_size * 100
+            else:
+                compression_ratio = 0
+            
+            return {
+                'success': True,
+                'original_size': original_size,
+                'compressed_size': compressed_size,
+                'compression_ratio': round(compression_ratio, 2),
+                'size_reduction': original_size - compressed_size
+            }
+            
+        except Exception as e:
+            print(f"Zopfli compression failed with error: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def compress_pdf_qpdf(self, input_path: str, output_path: str, 
+                          compression_level: str = 'medium',
+                          original_size: Optional[int] = None) -> Dict:
+        """
+        Lossless PDF compression using qpdf (if available).
+        
+        Args:
+            input_path: Path to the input PDF file
+            output_path: Path for the compressed PDF file
+            compression_level: Compression level ('low', 'medium', 'high')
+            original_size: Size of the input in bytes, if already known
+        
+        Returns:
+            Dictionary with compression results and statistics
+        """
+        try:
+            if not QPDF_PATH:
+                raise FileNotFoundError("qpdf is not installed")
+            
+            if original_size is None:
+                original_size = os.stat(input_path).st_size
+            print(f"qpdf compression - Original size: {original_size:,} bytes")
+            
+            qpdf_command = [
+                QPDF_PATH,
+                '--object-streams=generate',
+                '--compress-streams=y',
+                '--recompress-flate',
+                f'--compression-level={ZLIB_LEVELS.get(compression_level, 6)}',
+                input_path,
+                output_path
+            ]
+            
+            # Exit code 3 means the output was written with warnings
+            result = subprocess.run(qpdf_command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if result.returncode not in (0, 3):
+                raise RuntimeError(f"qpdf failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+            
+            compressed_size = os.stat(output_path).st_size
+            print(f"qpdf compression - Compressed size: {compressed_size:,} bytes")
+            
+            # Calculate compression ratio
+            if original_size > 0:
+                compression_ratio = (original_size - compressed_size) / original_size * 100
+            else:
+                compression_ratio = 0
+            
+            return {
+                'success': True,
+                'original_size': original_size,
+                'compressed_size': compressed_size,
+                'compression_ratio': round(compression_ratio, 2),
+                'size_reduction': original_size - compressed_size
+            }
+            
+        except Exception as e:
+            print(f"qpdf compression failed with error: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
     def compress_pdf_ghostscript(self, input_path: str, output_path: str, 
-                                compression_level: str = 'medium') -> Dict:
+                                compression_level: str = 'medium',
+                                original_size: Optional[int] = None) -> Dict:
         """
         PDF compression using Ghostscript (if available) - similar to professional tools.
         
+        Failures and output that is not smaller are reported as unsuccessful, so
+        compress_pdf's plan picks the next method.
+        
         Args:
             input_path: Path to the input PDF file
             output_path: Path for the compressed PDF file
             compression_level: Compression level ('low', 'medium', 'high')
+            original_size: Size of the input in bytes, if already known
         
         Returns:
             Dictionary with compression results and statistics
         """
         try:
-            if not os.path.exists(input_path):
-                raise FileNotFoundError(f"PDF file not found: {input_path}")
-            
-            original_size = os.path.getsize(input_path)
+            if original_size is None:
+                original_size = os.stat(input_path).st_size
             print(f"Ghostscript compression - Original size: {original_size:,} bytes")
             
             # Check if Ghostscript is available
-            try:
-                subprocess.run(['gs', '--version'], capture_output=True, check=True)
-                gs_available = True
-                print("Ghostscript is available")
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                gs_available = False
-                print("Ghostscript not available, falling back to alternative method")
-                return self.compress_pdf_advanced(input_path, output_path, compression_level)
+            if not self._check_gs():
+                raise FileNotFoundError("Ghostscript is not installed")
             
-            # Set compression parameters based on level
-            if compression_level == 'high':
-                dpi = "150"
-                quality = "printer"
-            elif compression_level == 'medium':
-                dpi = "200"
-                quality = "ebook"
-            else:  # low
-                dpi = "300"
-                quality = "prepress"
-            
-            # Ghostscript command for PDF compression
-            gs_command = [
-                'gs',
-                '-sDEVICE=pdfwrite',
-                '-dCompatibilityLevel=1.4',
-                f'-dPDFSETTINGS=/{quality}',
-                f'-dNOPAUSE',
-                f'-dQUIET',
-                f'-dBATCH',
-                f'-dNOPAUSE',
-                f'-dNOPROMPT',
-                f'-dOptimize=true',
-                f'-dCompressFonts=true',
-                f'-dSubsetFonts=true',
-                f'-dColorImageDownsampleType=/Bicubic',
-                f'-dColorImageResolution={dpi}',
-                f'-dGrayImageDownsampleType=/Bicubic',
-                f'-dGrayImageResolution={dpi}',
-                f'-dMonoImageDownsampleType=/Bicubic',
-                f'-dMonoImageResolution={dpi}',
-                f'-sOutputFile={output_path}',
-                input_path
-            ]
+            # Ghostscript command for PDF compression; output goes to stdout so rejected output never touches disk
+            gs_command = GS_ARGV.get(compression_level, GS_ARGV['low']) + [input_path]
             
             print(f"Running Ghostscript command: {' '.join(gs_command)}")
             
-            # Run Ghostscript
-            result = subprocess.run(gs_command, capture_output=True, text=True)
+            # Run Ghostscript; stdout carries the PDF, stderr is only decoded on failure
+            result = subprocess.run(gs_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
             
             if result.returncode == 0:
-                compressed_size = os.path.getsize(output_path)
+                compressed_size = len(result.stdout)
                 print(f"Ghostscript compression - Compressed size: {compressed_size:,} bytes")
                 
+                # Only keep the output if it is actually smaller
+                if not 0 < compressed_size < original_size:
+                    raise RuntimeError("Ghostscript output is not smaller than the original")
+                
+                with open(output_path, 'wb') as output_file:
+                    output_file.write(result.stdout)
+                
                 # Calculate compression ratio
                 if original_size > 0:
                     compression_ratio = (original_size - compressed_size) / original_size * 100
@@ -619,12 +1186,14 @@ class PDFCompressor:
                     'size_reduction': original_size - compressed_size
                 }
             else:
-                print(f"Ghostscript failed: {result.stderr}")
-                return self.compress_pdf_advanced(input_path, output_path, compression_level)
+                raise RuntimeError(f"Ghostscript failed: {result.stderr.decode('utf-8', 'replace').strip()}")
                 
         except Exception as e:
             print(f"Ghostscript compression failed with error: {e}")
-            return self.compress_pdf_advanced(input_path, output_path, compression_level)
+            return {
+                'success': False,
+                'error': str(e)
+            }
 
     def get_compression_estimate(self, pdf_path: str) -> Dict:
         """
@@ -637,34 +1206,9 @@ class PDFCompressor:
             Dictionary with compression estimates
         """
         try:
-            reader = PdfReader(pdf_path)
-            file_size = os.path.getsize(pdf_path)
-            
-            # Basic estimates based on PDF characteristics
-            has_images = False
-            has_metadata = bool(reader.metadata)
-            page_count = len(reader.pages)
-            
-            # Simple heuristic for compression potential
-            estimated_reduction = 0
-            if has_metadata:
-                estimated_reduction += 5  # 5% from metadata removal
-            if page_count > 10:
-                estimated_reduction += 15  # 15% from content compression
-            if has_images:
-                estimated_reduction += 25  # 25% from image compression
-            else:
-                estimated_reduction += 10  # 10% from general compression
-            
-            estimated_reduction = min(estimated_reduction, 60)  # Cap at 60%
-            
-            return {
-                'current_size': file_size,
-                'estimated_reduction_percent': estimated_reduction,
-                'estimated_new_size': int(file_size * (100 - estimated_reduction) / 100),
-                'page_count': page_count,
-                'has_metadata': has_metadata
-            }
+            # Keyed on mtime and size so a replaced file is re-estimated
+            st = os.stat(pdf_path)
+            return dict(_estimate_compression(pdf_path, st.st_mtime_ns, st.st_size))
             
         except Exception as e:
             return {'error': str(e)}
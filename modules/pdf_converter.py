@@ -9,6 +9,7 @@ from PIL import Image
 from pypdf import PdfReader
 from typing import List, Dict, Optional, Tuple
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 # Import pdf2image for PDF to image conversion
 try:
@@ -17,6 +18,39 @@ try:
 except ImportError:
     PDF2IMAGE_AVAILABLE = False
 
+# PyMuPDF renders pages in-process and is preferred over pdf2image when installed
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+# Parallel poppler processes per conversion; rasterization stops scaling beyond a few
+RASTER_THREADS = min(os.cpu_count() or 1, 4)
+
+# Share of currently available RAM that concurrent page rasters may occupy
+RASTER_MEMORY_SHARE = 0.5
+
+# resize_image targets below this many pixels are treated as thumbnails
+THUMBNAIL_MAX_SIZE = 512
+
+
+def _available_memory() -> Optional[int]:
+    """Return the currently available physical memory in bytes, or None if unknown."""
+    # MemAvailable counts reclaimable page cache; free pages alone (SC_AVPHYS_PAGES)
+    # understate it badly on a host that has been running for a while
+    try:
+        with open('/proc/meminfo', 'rb') as meminfo:
+            for line in meminfo:
+                if line.startswith(b'MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
 
 class PDFConverter:
     """Class to handle PDF conversion operations."""
@@ -43,33 +77,32 @@ class PDFConverter:
             if not image_paths:
                 raise ValueError("No image paths provided")
             
-            # Validate image files
-            valid_images = []
-            for img_path in image_paths:
-                if not os.path.exists(img_path):
-                    continue
-                ext = os.path.splitext(img_path)[1].lower()
-                if ext in self.supported_image_formats:
-                    valid_images.append(img_path)
+            # Validate and read image files concurrently; img2pdf then works on the bytes
+            # instead of opening every file again
+            with ThreadPoolExecutor(max_workers=min(32, len(image_paths))) as executor:
+                valid_images = [data for data in executor.map(self._read_image, image_paths)
+                                if data is not None]
             
             if not valid_images:
                 raise ValueError("No valid image files found")
             
             # Convert images to PDF using img2pdf
+            if page_size:
+                # Custom page size
+                layout = img2pdf.get_layout_fun(page_size)
+                pdf_bytes = img2pdf.convert(valid_images, layout_fun=layout)
+            else:
+                # Auto-size based on images
+                pdf_bytes = img2pdf.convert(valid_images)
+            
             with open(output_path, "wb") as f:
-                if page_size:
-                    # Custom page size
-                    layout = img2pdf.get_layout_fun(page_size)
-                    f.write(img2pdf.convert(valid_images, layout_fun=layout))
-                else:
-                    # Auto-size based on images
-                    f.write(img2pdf.convert(valid_images))
+                f.write(pdf_bytes)
             
             return {
                 'success': True,
                 'images_processed': len(valid_images),
                 'output_file': output_path,
-                'file_size': os.path.getsize(output_path)
+                'file_size': len(pdf_bytes)
             }
             
         except Exception as e:
@@ -78,6 +111,25 @@ class PDFConverter:
                 'error': str(e)
             }
     
+    def _read_image(self, image_path: str) -> Optional[bytes]:
+        """
+        Read an image file if it exists and has a supported extension.
+        
+        Args:
+            image_path: Path to the image file
+        
+        Returns:
+            File contents, or None if the file is missing or not a supported image
+        """
+        ext = os.path.splitext(image_path)[1].lower()
+        if ext not in self.supported_image_formats:
+            return None
+        try:
+            with open(image_path, 'rb') as image_file:
+                return image_file.read()
+        except FileNotFoundError:
+            return None
+    
     def image_to_pdf(self, image_path: str, output_path: str, 
                     page_size: Optional[str] = None) -> Dict:
         """
@@ -102,18 +154,20 @@ class PDFConverter:
                 'Legal': (612, 1008)
             }
             
+            if page_size and page_size in page_sizes:
+                layout = img2pdf.get_layout_fun(page_sizes[page_size])
+                pdf_bytes = img2pdf.convert([image_path], layout_fun=layout)
+            else:
+                pdf_bytes = img2pdf.convert([image_path])
+            
             with open(output_path, "wb") as f:
-                if page_size and page_size in page_sizes:
-                    layout = img2pdf.get_layout_fun(page_sizes[page_size])
-                    f.write(img2pdf.convert([image_path], layout_fun=layout))
-                else:
-                    f.write(img2pdf.convert([image_path]))
+                f.write(pdf_bytes)
             
             return {
                 'success': True,
                 'input_file': image_path,
                 'output_file': output_path,
-                'file_size': os.path.getsize(output_path)
+                'file_size': len(pdf_bytes)
             }
             
         except Exception as e:
@@ -124,22 +178,28 @@ class PDFConverter:
     
     def pdf_to_images(self, pdf_path: str, output_dir: str, 
                      image_format: str = 'PNG', dpi: int = 200,
-                     page_range: Optional[List[int]] = None) -> Dict:
+                     page_range: Optional[List[int]] = None,
+                     thread_count: Optional[int] = None) -> Dict:
         """
         Convert PDF pages to image files.
         
+        Pages are rendered in-process by PyMuPDF when it is installed. Otherwise
+        poppler renders them with several processes and writes the final image
+        files itself, so pages are never held in memory or re-encoded by PIL.
+        
         Args:
             pdf_path: Path to the PDF file
             output_dir: Directory where images will be saved
             image_format: Output image format ('PNG', 'JPEG')
             dpi: Resolution for the output images
             page_range: Optional list of page numbers to convert (1-based)
+            thread_count: Number of poppler processes (defaults to RASTER_THREADS; unused by PyMuPDF)
         
         Returns:
             Dictionary with conversion results
         """
         try:
-            if not PDF2IMAGE_AVAILABLE:
+            if fitz is None and not PDF2IMAGE_AVAILABLE:
                 return {
                     'success': False,
                     'error': 'PDF to image conversion requires pdf2image library. Please install: pip install pdf2image'
@@ -149,44 +209,179 @@ class PDFConverter:
                 raise FileNotFoundError(f"PDF file not found: {pdf_path}")
             
             os.makedirs(output_dir, exist_ok=True)
+            base_name = os.path.splitext(os.path.basename(pdf_path))[0]
             
-            # Convert PDF to images
-            if page_range:
-                images = convert_from_path(pdf_path, dpi=dpi, 
-                                         first_page=min(page_range),
-                                         last_page=max(page_range))
-            else:
-                images = convert_from_path(pdf_path, dpi=dpi)
+            # MuPDF renders in-process; poppler costs a subprocess and a pipe per call
+            render = self._render_with_pymupdf if fitz is not None else self._render_with_poppler
+            output_files, total_pages = render(pdf_path, output_dir, base_name, image_format,
+                                               dpi, page_range, thread_count)
             
-            output_files = []
-            base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+            return {
+                'success': True,
+                'output_files': output_files,
+                'page_count': len(output_files),
+                'total_pages': total_pages
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _render_with_poppler(self, pdf_path: str, output_dir: str, base_name: str,
+                             image_format: str, dpi: int, page_range: Optional[List[int]],
+                             thread_count: Optional[int]) -> Tuple[List[str], int]:
+        """
+        Rasterize pages with pdf2image, letting poppler write the image files in parallel.
+        
+        Returns:
+            Tuple of (paths of the kept page images, number of pages rendered)
+        """
+        first_page = min(page_range) if page_range else None
+        last_page = max(page_range) if page_range else None
+        wanted = set(page_range) if page_range else None
+        output_files = []
+        thread_count = self._memory_safe_thread_count(pdf_path, dpi, thread_count or RASTER_THREADS,
+                                                      first_page or 1)
+        
+        # Render into a scratch directory next to the output so files can be renamed into place
+        with tempfile.TemporaryDirectory(dir=output_dir) as render_dir:
+            rendered = convert_from_path(pdf_path, dpi=dpi,
+                                         first_page=first_page,
+                                         last_page=last_page,
+                                         fmt=image_format.lower(),
+                                         jpegopt={'quality': 95},
+                                         thread_count=thread_count,
+                                         output_folder=render_dir,
+                                         paths_only=True)
             
-            for i, image in enumerate(images):
-                if page_range and (i + 1) not in page_range:
+            for page_num, rendered_path in enumerate(rendered, start=first_page or 1):
+                if wanted is not None and page_num not in wanted:
                     continue
-                    
-                page_num = i + 1
-                if page_range:
-                    # Find the actual page number in the range
-                    actual_page = page_range[i] if i < len(page_range) else page_num
-                else:
-                    actual_page = page_num
                 
-                filename = f"{base_name}_page_{actual_page:03d}.{image_format.lower()}"
+                filename = f"{base_name}_page_{page_num:03d}.{image_format.lower()}"
                 filepath = os.path.join(output_dir, filename)
-                
-                # Convert to specified format
-                if image_format.upper() == 'JPEG':
-                    image = image.convert('RGB')
-                
-                image.save(filepath, format=image_format.upper(), quality=95)
+                os.replace(rendered_path, filepath)
+                output_files.append(filepath)
+        
+        return output_files, len(rendered)
+    
+    def _memory_safe_thread_count(self, pdf_path: str, dpi: int, thread_count: int,
+                                  page_number: int = 1) -> int:
+        """
+        Lower the number of poppler processes so their page rasters fit in memory.
+        
+        Each process holds one uncompressed RGBA raster of roughly
+        width_in * height_in * dpi^2 * 4 bytes, so a 600 dpi A4 page alone needs
+        about 135 MB. The page size is read in-process; convert_from_path already
+        runs pdfinfo once for the page count.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            dpi: Requested rendering resolution
+            thread_count: Requested number of poppler processes
+            page_number: 1-based page whose size stands in for the rendered pages
+        
+        Returns:
+            Number of processes whose rasters fit within RASTER_MEMORY_SHARE of available RAM
+        
+        Raises:
+            MemoryError: If a single page at this dpi would not fit
+        """
+        available = _available_memory()
+        if not available:
+            return thread_count
+        
+        try:
+            mediabox = PdfReader(pdf_path).pages[page_number - 1].mediabox
+            bytes_per_page = float(mediabox.width) / 72 * float(mediabox.height) / 72 * dpi ** 2 * 4
+        except Exception:
+            return thread_count
+        
+        budget = available * RASTER_MEMORY_SHARE
+        if bytes_per_page > budget:
+            raise MemoryError(
+                f"Rendering at {dpi} DPI needs about {bytes_per_page / 1024 ** 2:.0f} MB per page; "
+                f"use a lower DPI"
+            )
+        
+        safe_count = max(1, min(thread_count, int(budget // bytes_per_page)))
+        if safe_count < thread_count:
+            print(f"Reducing rasterization processes from {thread_count} to {safe_count} "
+                  f"to stay within available memory at {dpi} DPI")
+        return safe_count
+    
+    def _render_with_pymupdf(self, pdf_path: str, output_dir: str, base_name: str,
+                             image_format: str, dpi: int, page_range: Optional[List[int]],
+                             thread_count: Optional[int] = None) -> Tuple[List[str], int]:
+        """
+        Rasterize pages in-process with PyMuPDF.
+        
+        Only the requested pages are rendered; thread_count is ignored since a
+        MuPDF document must not be shared between threads.
+        
+        Returns:
+            Tuple of (paths of the page images, number of pages rendered)
+        """
+        output_files = []
+        with fitz.open(pdf_path) as doc:
+            if page_range:
+                page_numbers = sorted(p for p in set(page_range) if 1 <= p <= doc.page_count)
+            else:
+                page_numbers = range(1, doc.page_count + 1)
+            
+            for page_num in page_numbers:
+                pixmap = doc[page_num - 1].get_pixmap(dpi=dpi, alpha=False)
+                filename = f"{base_name}_page_{page_num:03d}.{image_format.lower()}"
+                filepath = os.path.join(output_dir, filename)
+                pixmap.save(filepath, output=image_format.lower(), jpg_quality=95)
                 output_files.append(filepath)
+        
+        return output_files, len(output_files)
+    
+    def batch_pdf_to_images(self, pdf_paths: List[str], output_dir: str,
+                            image_format: str = 'PNG', dpi: int = 200,
+                            num_workers: Optional[int] = None) -> Dict:
+        """
+        Convert several PDFs to images concurrently.
+        
+        Each PDF goes to its own subdirectory of output_dir. The rendering happens in
+        poppler processes, so threads are enough to keep num_workers files in flight;
+        the RASTER_THREADS process budget is shared between them.
+        
+        Args:
+            pdf_paths: List of paths to PDF files
+            output_dir: Directory where per-file image directories will be created
+            image_format: Output image format ('PNG', 'JPEG')
+            dpi: Resolution for the output images
+            num_workers: Number of files converted at once (defaults to RASTER_THREADS)
+        
+        Returns:
+            Dictionary with per-file results in input order
+        """
+        try:
+            if not pdf_paths:
+                raise ValueError("No PDF paths provided")
+            
+            num_workers = max(1, min(num_workers or RASTER_THREADS, len(pdf_paths)))
+            thread_count = max(1, RASTER_THREADS // num_workers)
+            
+            def convert(indexed_path):
+                index, pdf_path = indexed_path
+                base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+                file_dir = os.path.join(output_dir, f"{index + 1:03d}_{base_name}")
+                return self.pdf_to_images(pdf_path, file_dir, image_format, dpi,
+                                          thread_count=thread_count)
+            
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                results = list(executor.map(convert, enumerate(pdf_paths)))
             
             return {
-                'success': True,
-                'output_files': output_files,
-                'page_count': len(output_files),
-                'total_pages': len(images)
+                'success': all(result['success'] for result in results),
+                'results': results,
+                'files_processed': sum(1 for result in results if result['success']),
+                'page_count': sum(result.get('page_count', 0) for result in results)
             }
             
         except Exception as e:
@@ -219,7 +414,9 @@ class PDFConverter:
     
     def resize_image(self, image_path: str, output_path: str, 
                     max_width: int = 1920, max_height: int = 1080,
-                    quality: int = 85) -> Dict:
+                    quality: int = 85, resample: Optional[int] = None,
+                    progressive: bool = True, png_compress_level: int = 9,
+                    png_optimize: bool = False) -> Dict:
         """
         Resize an image while maintaining aspect ratio.
         
@@ -229,27 +426,50 @@ class PDFConverter:
             max_width: Maximum width in pixels
             max_height: Maximum height in pixels
             quality: JPEG quality (1-100)
+            resample: Pillow resampling filter (defaults to bilinear for thumbnails, Lanczos otherwise)
+            progressive: Whether to write a progressive JPEG (smaller, and renders early over the network)
+            png_compress_level: zlib level for PNG output (1 is fastest, 9 smallest)
+            png_optimize: Whether Pillow should search for the smallest PNG encoding; this
+                          always uses zlib level 9 and ignores png_compress_level
         
         Returns:
             Dictionary with resize results
         """
         try:
+            if resample is None:
+                # Lanczos is the slowest filter; its extra sharpness is invisible at thumbnail sizes
+                if max(max_width, max_height) < THUMBNAIL_MAX_SIZE:
+                    resample = Image.Resampling.BILINEAR
+                else:
+                    resample = Image.Resampling.LANCZOS
+            
             with Image.open(image_path) as img:
                 # Calculate new size maintaining aspect ratio
-                img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+                img.thumbnail((max_width, max_height), resample)
                 
                 # Save with specified quality
                 save_kwargs = {}
                 if img.format == 'JPEG' or output_path.lower().endswith('.jpg'):
                     save_kwargs['quality'] = quality
-                    save_kwargs['optimize'] = True
+                    save_kwargs['optimize'] = True  # Optimal Huffman tables
+                    save_kwargs['progressive'] = progressive
+                    # 4:2:0 chroma subsampling, except at high quality where colour edges would show
+                    save_kwargs['subsampling'] = 2 if quality < 90 else 0
+                elif output_path.lower().endswith('.png'):
+                    save_kwargs['compress_level'] = png_compress_level
+                    # Pillow's optimize overrides compress_level, so it is only set on request
+                    if png_optimize:
+                        save_kwargs['optimize'] = True
                 
-                img.save(output_path, **save_kwargs)
+                # Pillow still picks the format from the file name; the position gives the size
+                with open(output_path, 'wb') as output_file:
+                    img.save(output_file, **save_kwargs)
+                    resized_size = output_file.tell()
                 
                 return {
                     'success': True,
                     'original_size': os.path.getsize(image_path),
-                    'resized_size': os.path.getsize(output_path),
+                    'resized_size': resized_size,
                     'new_dimensions': img.size
                 }
                 
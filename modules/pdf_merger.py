@@ -4,16 +4,44 @@ Handles merging multiple PDF files into a single PDF document.
 """
 
 import os
+from itertools import compress
+from functools import lru_cache
+from contextlib import ExitStack
 from pypdf import PdfWriter, PdfReader
-from typing import List, Optional
+from typing import List, Dict, Optional
+
+try:
+    import pikepdf  # qpdf bindings: native merging that keeps content streams as they are
+except ImportError:
+    pikepdf = None
+
+
+@lru_cache(maxsize=128)
+def _read_pdf_info(pdf_path: str, mtime_ns: int, file_size: int) -> Dict:
+    """
+    Read page count, encryption and basic metadata of one version of a PDF file.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        mtime_ns: Modification time of the file, part of the cache key
+        file_size: Size of the file in bytes, part of the cache key
+    
+    Returns:
+        Dictionary with PDF information
+    """
+    reader = PdfReader(pdf_path)
+    metadata = reader.metadata
+    return {
+        'pages': len(reader.pages),
+        'encrypted': reader.is_encrypted,
+        'title': metadata.get('/Title', 'Unknown') if metadata else 'Unknown',
+        'author': metadata.get('/Author', 'Unknown') if metadata else 'Unknown'
+    }
 
 
 class PDFMerger:
     """Class to handle PDF merging operations."""
     
-    def __init__(self):
-        self.writer = PdfWriter()
-    
     def merge_pdfs(self, pdf_paths: List[str], output_path: str, 
                    page_ranges: Optional[List[str]] = None) -> bool:
         """
@@ -28,26 +56,37 @@ class PDFMerger:
             bool: True if merge successful, False otherwise
         """
         try:
+            if pikepdf is not None:
+                self._merge_with_pikepdf(pdf_paths, output_path, page_ranges)
+                return True
+            
+            # A fresh writer per call, so one merge never leaks pages into the next
+            writer = PdfWriter()
+            
+            # The same file may be listed more than once; parse it only once
+            readers = {}
             for i, pdf_path in enumerate(pdf_paths):
-                if not os.path.exists(pdf_path):
-                    raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-                
-                reader = PdfReader(pdf_path)
+                reader = readers.get(pdf_path)
+                if reader is None:
+                    if not os.path.exists(pdf_path):
+                        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+                    reader = readers[pdf_path] = PdfReader(pdf_path)
                 
-                # Determine which pages to include
+                # Determine which pages to include; parsed ranges are already sorted and in
+                # bounds, and whole documents are passed as a (start, stop) span
+                total_pages = len(reader.pages)
                 if page_ranges and i < len(page_ranges) and page_ranges[i] != "all":
-                    pages_to_add = self._parse_page_range(page_ranges[i], len(reader.pages))
+                    pages_to_add = self._parse_page_range(page_ranges[i], total_pages)
                 else:
-                    pages_to_add = list(range(len(reader.pages)))
+                    pages_to_add = (0, total_pages)
                 
-                # Add specified pages to the writer
-                for page_num in pages_to_add:
-                    if 0 <= page_num < len(reader.pages):
-                        self.writer.add_page(reader.pages[page_num])
+                # Copy the selected pages in one call; objects shared between them are cloned once
+                if pages_to_add and total_pages:
+                    writer.append(reader, pages=pages_to_add, import_outline=False)
             
             # Write the merged PDF
             with open(output_path, 'wb') as output_file:
-                self.writer.write(output_file)
+                writer.write(output_file)
             
             return True
             
@@ -55,6 +94,37 @@ class PDFMerger:
             print(f"Error merging PDFs: {str(e)}")
             return False
     
+    def _merge_with_pikepdf(self, pdf_paths: List[str], output_path: str,
+                            page_ranges: Optional[List[str]] = None) -> None:
+        """
+        Merge PDF files with pikepdf, writing compressed object streams.
+        
+        qpdf copies pages from the sources when the result is saved, so every
+        source stays open until then.
+        
+        Args:
+            pdf_paths: List of paths to PDF files to merge
+            output_path: Path where the merged PDF will be saved
+            page_ranges: Optional list of page ranges for each PDF
+        """
+        with ExitStack() as stack, pikepdf.Pdf.new() as merged:
+            # The same file may be listed more than once; open it only once
+            sources = {}
+            for i, pdf_path in enumerate(pdf_paths):
+                source = sources.get(pdf_path)
+                if source is None:
+                    if not os.path.exists(pdf_path):
+                        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+                    source = sources[pdf_path] = stack.enter_context(pikepdf.open(pdf_path))
+                
+                if page_ranges and i < len(page_ranges) and page_ranges[i] != "all":
+                    pages_to_add = self._parse_page_range(page_ranges[i], len(source.pages))
+                    merged.pages.extend(source.pages[page_num] for page_num in pages_to_add)
+                else:
+                    merged.pages.extend(source.pages)
+            
+            merged.save(output_path, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    
     def _parse_page_range(self, page_range: str, total_pages: int) -> List[int]:
         """
         Parse page range string into list of page indices (0-based).
@@ -66,7 +136,16 @@ class PDFMerger:
         Returns:
             List of 0-based page indices
         """
-        pages = []
+        # Fast path for a single page or a single range, the common UI input
+        if ',' not in page_range:
+            start, dash, end = page_range.partition('-')
+            if not dash:
+                page = int(start) - 1
+                return [page] if 0 <= page < total_pages else []
+            return list(range(max(0, int(start) - 1), min(total_pages, int(end))))
+        
+        # One byte per page marks selection, so overlaps dedupe and the result comes out sorted
+        mask = bytearray(total_pages)
         parts = page_range.split(',')
         
         for part in parts:
@@ -77,14 +156,15 @@ class PDFMerger:
                 # Convert to 0-based indexing
                 start = max(0, start - 1)
                 end = min(total_pages, end)
-                pages.extend(range(start, end))
+                if start < end:
+                    mask[start:end] = b'\x01' * (end - start)
             else:
                 # Handle single page like "5"
                 page = int(part) - 1  # Convert to 0-based
                 if 0 <= page < total_pages:
-                    pages.append(page)
+                    mask[page] = 1
         
-        return sorted(list(set(pages)))  # Remove duplicates and sort
+        return list(compress(range(total_pages), mask))
     
     def get_pdf_info(self, pdf_path: str) -> dict:
         """
@@ -97,12 +177,8 @@ class PDFMerger:
             Dictionary with PDF information
         """
         try:
-            reader = PdfReader(pdf_path)
-            return {
-                'pages': len(reader.pages),
-                'encrypted': reader.is_encrypted,
-                'title': reader.metadata.get('/Title', 'Unknown') if reader.metadata else 'Unknown',
-                'author': reader.metadata.get('/Author', 'Unknown') if reader.metadata else 'Unknown'
-            }
+            # Keyed on mtime and size so a replaced file is read again
+            st = os.stat(pdf_path)
+            return dict(_read_pdf_info(pdf_path, st.st_mtime_ns, st.st_size))
         except Exception as e:
             return {'error': str(e)}
@@ -5,7 +5,45 @@ Handles splitting PDF files into multiple documents by page ranges.
 
 import os
 from pypdf import PdfWriter, PdfReader
-from typing import List, Dict, Optional
+from functools import lru_cache
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple, Iterator
+
+try:
+    import pikepdf  # qpdf bindings: native page copying that keeps content streams as they are
+except ImportError:
+    pikepdf = None
+
+
+@lru_cache(maxsize=128)
+def _read_page_info(pdf_path: str, mtime_ns: int, file_size: int) -> Tuple:
+    """
+    Read the size and rotation of every page of one version of a PDF file.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        mtime_ns: Modification time of the file, part of the cache key
+        file_size: Size of the file in bytes, part of the cache key
+    
+    Returns:
+        Tuple of (page count, per-page info dicts, encryption flag)
+    """
+    reader = PdfReader(pdf_path)
+    pages = reader.pages
+    
+    # pypdf copies inherited /MediaBox and /Rotate onto each page, so read the raw
+    # entries instead of building a RectangleObject per page
+    pages_info = []
+    for i, page in enumerate(pages):
+        left, bottom, right, top = (float(value) for value in page['/MediaBox'])
+        pages_info.append({
+            'page_number': i + 1,
+            'width': abs(right - left),
+            'height': abs(top - bottom),
+            'rotation': page.get('/Rotate', 0)
+        })
+    
+    return len(pages), tuple(pages_info), reader.is_encrypted
 
 
 class PDFSplitter:
@@ -29,31 +67,32 @@ class PDFSplitter:
             if not os.path.exists(pdf_path):
                 raise FileNotFoundError(f"PDF file not found: {pdf_path}")
             
-            reader = PdfReader(pdf_path)
-            total_pages = len(reader.pages)
-            created_files = []
-            
             # Create output directory if it doesn't exist
             os.makedirs(output_dir, exist_ok=True)
+            created_files = []
             
-            if split_ranges:
-                # Split based on provided ranges
-                for i, range_info in enumerate(split_ranges):
-                    start = max(0, range_info.get('start', 1) - 1)  # Convert to 0-based
-                    end = min(total_pages, range_info.get('end', total_pages))
-                    name = range_info.get('name', f'split_{i+1}')
-                    
-                    if start < end:
-                        output_path = os.path.join(output_dir, f"{name}.pdf")
-                        if self._create_pdf_from_pages(reader, start, end, output_path):
+            # Resolve the page tree once; every output file takes a slice of this list
+            with self._open_pages(pdf_path) as pages:
+                total_pages = len(pages)
+                
+                if split_ranges:
+                    # Split based on provided ranges
+                    for i, range_info in enumerate(split_ranges):
+                        start = max(0, range_info.get('start', 1) - 1)  # Convert to 0-based
+                        end = min(total_pages, range_info.get('end', total_pages))
+                        name = range_info.get('name', f'split_{i+1}')
+                        
+                        if start < end:
+                            output_path = os.path.join(output_dir, f"{name}.pdf")
+                            if self._create_pdf_from_pages(pages[start:end], output_path):
+                                created_files.append(output_path)
+                else:
+                    # Split into individual pages
+                    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+                    for page_num in range(total_pages):
+                        output_path = os.path.join(output_dir, f"{base_name}_page_{page_num + 1}.pdf")
+                        if self._create_pdf_from_pages(pages[page_num:page_num + 1], output_path):
                             created_files.append(output_path)
-            else:
-                # Split into individual pages
-                base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-                for page_num in range(total_pages):
-                    output_path = os.path.join(output_dir, f"{base_name}_page_{page_num + 1}.pdf")
-                    if self._create_pdf_from_pages(reader, page_num, page_num + 1, output_path):
-                        created_files.append(output_path)
             
             return created_files
             
@@ -74,20 +113,20 @@ class PDFSplitter:
             List of paths to created PDF files
         """
         try:
-            reader = PdfReader(pdf_path)
-            total_pages = len(reader.pages)
             created_files = []
-            
             os.makedirs(output_dir, exist_ok=True)
             base_name = os.path.splitext(os.path.basename(pdf_path))[0]
             
-            for start in range(0, total_pages, pages_per_file):
-                end = min(start + pages_per_file, total_pages)
-                file_num = (start // pages_per_file) + 1
-                output_path = os.path.join(output_dir, f"{base_name}_part_{file_num}.pdf")
+            with self._open_pages(pdf_path) as pages:
+                total_pages = len(pages)
                 
-                if self._create_pdf_from_pages(reader, start, end, output_path):
-                    created_files.append(output_path)
+                for start in range(0, total_pages, pages_per_file):
+                    end = min(start + pages_per_file, total_pages)
+                    file_num = (start // pages_per_file) + 1
+                    output_path = os.path.join(output_dir, f"{base_name}_part_{file_num}.pdf")
+                    
+                    if self._create_pdf_from_pages(pages[start:end], output_path):
+                        created_files.append(output_path)
             
             return created_files
             
@@ -108,43 +147,59 @@ class PDFSplitter:
             bool: True if extraction successful, False otherwise
         """
         try:
-            reader = PdfReader(pdf_path)
-            writer = PdfWriter()
-            
-            for page_num in page_numbers:
+            with self._open_pages(pdf_path) as pages:
                 # Convert to 0-based indexing
-                page_index = page_num - 1
-                if 0 <= page_index < len(reader.pages):
-                    writer.add_page(reader.pages[page_index])
-            
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
-            
-            return True
+                selected = [pages[page_num - 1] for page_num in page_numbers
+                            if 0 < page_num <= len(pages)]
+                return self._create_pdf_from_pages(selected, output_path)
             
         except Exception as e:
             print(f"Error extracting pages: {str(e)}")
             return False
     
-    def _create_pdf_from_pages(self, reader: PdfReader, start: int, end: int, output_path: str) -> bool:
+    @contextmanager
+    def _open_pages(self, pdf_path: str) -> Iterator[list]:
+        """
+        Open a PDF and yield its pages, as pikepdf pages when pikepdf is installed.
+        
+        The source stays open for the duration of the block, since qpdf copies
+        page objects from it only when an output file is saved.
+        
+        Args:
+            pdf_path: Path to the PDF file
+        
+        Yields:
+            List of the document's pages
+        """
+        if pikepdf is not None:
+            with pikepdf.open(pdf_path) as source:
+                yield list(source.pages)
+        else:
+            yield list(PdfReader(pdf_path).pages)
+    
+    def _create_pdf_from_pages(self, pages: list, output_path: str) -> bool:
         """
-        Create a PDF file from a range of pages.
+        Create a PDF file from a list of pages.
         
         Args:
-            reader: PdfReader object
-            start: Start page index (0-based, inclusive)
-            end: End page index (0-based, exclusive)
+            pages: Pages from _open_pages, in output order
             output_path: Path for the output PDF file
         
         Returns:
             bool: True if creation successful, False otherwise
         """
         try:
+            if pikepdf is not None:
+                # qpdf writes natively and keeps content streams byte-for-byte
+                with pikepdf.Pdf.new() as target:
+                    target.pages.extend(pages)
+                    target.save(output_path, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+                return True
+            
             writer = PdfWriter()
             
-            for page_index in range(start, end):
-                if page_index < len(reader.pages):
-                    writer.add_page(reader.pages[page_index])
+            for page in pages:
+                writer.add_page(page)
             
             with open(output_path, 'wb') as output_file:
                 writer.write(output_file)
@@ -166,22 +221,14 @@ class PDFSplitter:
             Dictionary with page information
         """
         try:
-            reader = PdfReader(pdf_path)
-            pages_info = []
-            
-            for i, page in enumerate(reader.pages):
-                page_info = {
-                    'page_number': i + 1,
-                    'width': float(page.mediabox.width),
-                    'height': float(page.mediabox.height),
-                    'rotation': page.get('/Rotate', 0)
-                }
-                pages_info.append(page_info)
+            # Keyed on mtime and size so a replaced file is read again
+            st = os.stat(pdf_path)
+            total_pages, pages, encrypted = _read_page_info(pdf_path, st.st_mtime_ns, st.st_size)
             
             return {
-                'total_pages': len(reader.pages),
-                'pages': pages_info,
-                'encrypted': reader.is_encrypted
+                'total_pages': total_pages,
+                'pages': [dict(page_info) for page_info in pages],
+                'encrypted': encrypted
             }
             
         except Exception as e:
@@ -4,8 +4,181 @@ Handles removing password protection from secured PDF files.
 """
 
 import os
+import re
+import mmap
+import warnings
+import multiprocessing
 from pypdf import PdfReader, PdfWriter
-from typing import Dict, Optional
+from pypdf.errors import DependencyError
+from typing import Dict, List, Optional, Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import pikepdf  # qpdf bindings: decrypts and rewrites the whole file natively
+except ImportError:
+    pikepdf = None
+
+# Passwords tried by try_common_passwords after any custom ones
+COMMON_PASSWORDS = (
+    '', '123456', 'password', '123456789', '12345678',
+    'abc123', 'Password', '123123', 'admin', 'user',
+    '1234', '12345', 'qwerty', 'letmein', 'welcome'
+)
+
+# Candidate lists shorter than this are checked in-process; starting worker
+# processes and parsing the document in each costs more than the guesses
+PARALLEL_PASSWORD_MIN = 64
+
+# pypdf issues many small writes while serializing; batch them into few syscalls
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Bytes read around each trailer location when only the encryption flag is needed
+TRAILER_SCAN_BYTES = 4096
+
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+_ENCRYPT_RE = re.compile(rb'/Encrypt[\s/<\d]')
+
+
+def _has_encrypt_entry(pdf_path: str) -> bool:
+    """
+    Tell whether a PDF is encrypted by looking for /Encrypt in its trailers.
+    
+    Only the regions that can hold the governing trailer are read: the end of
+    the file (classic trailer), the start of the file (first-page trailer of a
+    linearized file) and the object at the last startxref offset (cross-reference
+    stream dictionary). A first-page trailer can sit beyond the scanned head when
+    its cross-reference section is long, so when none of them mention /Encrypt
+    the trailer is parsed to confirm.
+    
+    Args:
+        pdf_path: Path to the PDF file
+    
+    Returns:
+        bool: True if an /Encrypt entry was found
+    """
+    with open(pdf_path, 'rb') as pdf_file:
+        file_size = os.fstat(pdf_file.fileno()).st_size
+        head = pdf_file.read(TRAILER_SCAN_BYTES)
+        pdf_file.seek(max(0, file_size - TRAILER_SCAN_BYTES))
+        tail = pdf_file.read()
+        regions = [head, tail]
+        
+        offsets = _STARTXREF_RE.findall(tail)
+        if offsets:
+            pdf_file.seek(min(int(offsets[-1]), file_size))
+            regions.append(pdf_file.read(TRAILER_SCAN_BYTES))
+    
+    if any(_ENCRYPT_RE.search(region) for region in regions):
+        return True
+    
+    try:
+        return _read_pdf(pdf_path).is_encrypted
+    except DependencyError:
+        # Only raised while setting up an AES security handler
+        return True
+
+
+def _open_with_pikepdf(pdf_path: str, password: str = '') -> Optional['pikepdf.Pdf']:
+    """
+    Open a PDF with pikepdf, returning None if the password is wrong.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        password: User or owner password
+    
+    Returns:
+        The opened document, or None if the password does not open it
+    """
+    try:
+        with warnings.catch_warnings():
+            # pikepdf warns when a password is passed for an unencrypted file
+            warnings.simplefilter('ignore', UserWarning)
+            return pikepdf.open(pdf_path, password=password)
+    except pikepdf.PasswordError:
+        return None
+
+
+def _read_pdf(pdf_path: str) -> PdfReader:
+    """
+    Parse a PDF through a read-only memory map instead of reading it into memory.
+    
+    PdfReader copies a file path's whole contents into a BytesIO; over a mapping
+    its xref lookups and seeks only touch the page cache. The map stays alive as
+    long as the reader and is released with it.
+    
+    Args:
+        pdf_path: Path to the PDF file
+    
+    Returns:
+        PdfReader backed by the mapped file
+    """
+    with open(pdf_path, 'rb') as pdf_file:
+        return PdfReader(mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def _parse_for_guessing(pdf_path: str) -> Optional[PdfReader]:
+    """
+    Parse a PDF once so password guesses only run the security handler's key check.
+    
+    pypdf hands the MD5/RC4/AES work of that check to OpenSSL when cryptography
+    is installed.
+    
+    Args:
+        pdf_path: Path to the PDF file
+    
+    Returns:
+        The parsed document, or None if pypdf cannot open it without cryptography
+    """
+    try:
+        return _read_pdf(pdf_path)
+    except DependencyError:
+        # AES-256 without cryptography: qpdf checks the guesses instead
+        if pikepdf is None:
+            raise
+        return None
+
+
+def _check_password(reader: Optional[PdfReader], pdf_path: str, password: str) -> bool:
+    """
+    Check one password guess without writing anything.
+    
+    Args:
+        reader: Parsed document, or None if pypdf cannot open it
+        pdf_path: Path to the encrypted PDF file
+        password: Password to check
+    
+    Returns:
+        bool: True if the password opens the document
+    """
+    if reader is not None:
+        try:
+            return bool(reader.decrypt(password))
+        except DependencyError:
+            if pikepdf is None:
+                raise
+    
+    pdf = _open_with_pikepdf(pdf_path, password)
+    if pdf is None:
+        return False
+    pdf.close()
+    return True
+
+
+# Per-process state for parallel password checks, set up by _init_password_worker
+_worker_reader = None
+_worker_path = None
+
+
+def _init_password_worker(pdf_path: str) -> None:
+    """Parse the document once in each worker process."""
+    global _worker_reader, _worker_path
+    _worker_path = pdf_path
+    _worker_reader = _parse_for_guessing(pdf_path)
+
+
+def _check_password_in_worker(password: str) -> bool:
+    """Check one password guess against the worker's parsed document."""
+    return _check_password(_worker_reader, _worker_path, password)
 
 
 class PDFUnlocker:
@@ -28,7 +201,34 @@ class PDFUnlocker:
             if not os.path.exists(input_path):
                 raise FileNotFoundError(f"PDF file not found: {input_path}")
             
-            reader = PdfReader(input_path)
+            if pikepdf is not None:
+                pdf = _open_with_pikepdf(input_path, password)
+                if pdf is None:
+                    return {
+                        'success': False,
+                        'error': 'Incorrect password provided'
+                    }
+                
+                with pdf:
+                    if not pdf.is_encrypted:
+                        return {
+                            'success': False,
+                            'error': 'PDF file is not password protected'
+                        }
+                    
+                    # qpdf drops the encryption on save and keeps everything else as is
+                    pdf.save(output_path)
+                    pages_unlocked = len(pdf.pages)
+                
+                return {
+                    'success': True,
+                    'input_file': input_path,
+                    'output_file': output_path,
+                    'pages_unlocked': pages_unlocked,
+                    'file_size': os.path.getsize(output_path)
+                }
+            
+            reader = _read_pdf(input_path)
             
             # Check if PDF is encrypted
             if not reader.is_encrypted:
@@ -45,24 +245,21 @@ class PDFUnlocker:
                 }
             
             # Create writer and copy all pages
-            writer = PdfWriter()
-            for page in reader.pages:
-                writer.add_page(page)
-            
-            # Copy metadata if available
-            if reader.metadata:
-                writer.add_metadata(reader.metadata)
+            # Clone the decrypted document in one pass; the clone carries metadata,
+            # outlines and forms, and is written without the /Encrypt entry
+            writer = PdfWriter(clone_from=reader)
             
             # Write the unlocked PDF
-            with open(output_path, 'wb') as output_file:
+            with open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as output_file:
                 writer.write(output_file)
+                file_size = output_file.tell()
             
             return {
                 'success': True,
                 'input_file': input_path,
                 'output_file': output_path,
                 'pages_unlocked': len(reader.pages),
-                'file_size': os.path.getsize(output_path)
+                'file_size': file_size
             }
             
         except Exception as e:
@@ -85,50 +282,42 @@ class PDFUnlocker:
             Dictionary with unlock results
         """
         try:
-            reader = PdfReader(pdf_path)
+            # Custom passwords are tried before the common ones
+            if custom_passwords:
+                passwords_to_try = (*custom_passwords, *COMMON_PASSWORDS)
+            else:
+                passwords_to_try = COMMON_PASSWORDS
             
-            if not reader.is_encrypted:
+            reader = _parse_for_guessing(pdf_path)
+            
+            if reader is not None and not reader.is_encrypted:
                 return {
                     'success': False,
                     'error': 'PDF file is not password protected'
                 }
             
-            # Common passwords to try
-            common_passwords = [
-                '', '123456', 'password', '123456789', '12345678',
-                'abc123', 'Password', '123123', 'admin', 'user',
-                '1234', '12345', 'qwerty', 'letmein', 'welcome'
-            ]
-            
-            # Add custom passwords if provided
-            if custom_passwords:
-                passwords_to_try = custom_passwords + common_passwords
-            else:
-                passwords_to_try = common_passwords
-            
-            # Try each password
-            for password in passwords_to_try:
-                try:
-                    if reader.decrypt(password):
-                        # Password found, unlock the PDF
-                        writer = PdfWriter()
-                        for page in reader.pages:
-                            writer.add_page(page)
-                        
-                        if reader.metadata:
-                            writer.add_metadata(reader.metadata)
-                        
-                        with open(output_path, 'wb') as output_file:
-                            writer.write(output_file)
-                        
-                        return {
-                            'success': True,
-                            'password_found': password if password else '[empty password]',
-                            'output_file': output_path,
-                            'pages_unlocked': len(reader.pages)
-                        }
-                except:
-                    continue
+            password = self._find_password(reader, pdf_path, passwords_to_try)
+            if password is not None:
+                # Password found, unlock the PDF
+                if pikepdf is not None:
+                    with pikepdf.open(pdf_path, password=password) as pdf:
+                        pdf.save(output_path)
+                        pages_unlocked = len(pdf.pages)
+                else:
+                    # The match may have come from a worker process
+                    reader.decrypt(password)
+                    writer = PdfWriter(clone_from=reader)
+                    
+                    with open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as output_file:
+                        writer.write(output_file)
+                    pages_unlocked = len(reader.pages)
+                
+                return {
+                    'success': True,
+                    'password_found': password if password else '[empty password]',
+                    'output_file': output_path,
+                    'pages_unlocked': pages_unlocked
+                }
             
             return {
                 'success': False,
@@ -141,40 +330,96 @@ class PDFUnlocker:
                 'error': str(e)
             }
     
-    def check_pdf_encryption(self, pdf_path: str) -> Dict:
+    def _find_password(self, reader: Optional[PdfReader], pdf_path: str,
+                       passwords: Sequence[str]) -> Optional[str]:
+        """
+        Return the first password in the list that opens the document.
+        
+        Long lists are split across worker processes, each of which parses the
+        document once in its initializer; short lists are checked in-process.
+        Workers are started from a forkserver (or spawned) rather than forked, so
+        they never inherit locks held by other threads of the web server.
+        
+        Args:
+            reader: Parsed document from _parse_for_guessing
+            pdf_path: Path to the encrypted PDF file
+            passwords: Candidate passwords in priority order
+        
+        Returns:
+            The matching password, or None if none of them match
+        """
+        workers = os.cpu_count() or 1
+        if len(passwords) < PARALLEL_PASSWORD_MIN or workers < 2:
+            return next((password for password in passwords
+                         if _check_password(reader, pdf_path, password)), None)
+        
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_password_worker, initargs=(pdf_path,)) as executor:
+            chunksize = max(1, len(passwords) // (4 * workers))
+            results = executor.map(_check_password_in_worker, passwords, chunksize=chunksize)
+            # Results come back in list order, so custom passwords keep their priority
+            for password, matched in zip(passwords, results):
+                if matched:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return password
+        return None
+    
+    def check_pdf_encryption(self, pdf_path: str, detailed: bool = True,
+                             fields: Optional[List[str]] = None) -> Dict:
         """
         Check if a PDF file is encrypted and get encryption details.
         
         Args:
             pdf_path: Path to the PDF file
+            detailed: Also parse the document for its page count and metadata;
+                      when False only the trailers are scanned
+            fields: Metadata keys to report (e.g. ['/Title']); None reports all
+                    of them and an empty list skips the metadata
         
         Returns:
             Dictionary with encryption information
         """
         try:
-            if not os.path.exists(pdf_path):
-                raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+            # One stat both checks existence and gives the size
+            try:
+                file_size = os.stat(pdf_path).st_size
+            except FileNotFoundError:
+                raise FileNotFoundError(f"PDF file not found: {pdf_path}") from None
+            
+            if not detailed:
+                is_encrypted = _has_encrypt_entry(pdf_path)
+                encryption_info = {
+                    'is_encrypted': is_encrypted,
+                    'file_size': file_size,
+                    'can_extract_text': not is_encrypted,
+                    'can_print': not is_encrypted,
+                    'can_modify': not is_encrypted
+                }
+                if is_encrypted:
+                    encryption_info['encryption_type'] = 'Standard PDF encryption'
+                return encryption_info
             
-            reader = PdfReader(pdf_path)
+            reader = _read_pdf(pdf_path)
             
             encryption_info = {
                 'is_encrypted': reader.is_encrypted,
-                'file_size': os.path.getsize(pdf_path),
+                'file_size': file_size,
                 'pages': len(reader.pages) if not reader.is_encrypted else 'Unknown (encrypted)'
             }
             
             if reader.is_encrypted:
-                # Try to get more info about encryption (this might not work for all PDFs)
-                try:
-                    # Some basic info might be available even when encrypted
-                    encryption_info['encryption_type'] = 'Standard PDF encryption'
-                    encryption_info['can_extract_text'] = False
-                    encryption_info['can_print'] = False
-                    encryption_info['can_modify'] = False
-                except:
-                    pass
+                encryption_info['encryption_type'] = 'Standard PDF encryption'
+                encryption_info['can_extract_text'] = False
+                encryption_info['can_print'] = False
+                encryption_info['can_modify'] = False
             else:
-                encryption_info['metadata'] = dict(reader.metadata) if reader.metadata else {}
+                if fields is None:
+                    encryption_info['metadata'] = dict(reader.metadata) if reader.metadata else {}
+                elif fields:
+                    metadata = reader.metadata or {}
+                    encryption_info['metadata'] = {key: metadata[key] for key in fields if key in metadata}
                 encryption_info['can_extract_text'] = True
                 encryption_info['can_print'] = True
                 encryption_info['can_modify'] = True
@@ -198,7 +443,32 @@ class PDFUnlocker:
             Dictionary with results
         """
         try:
-            reader = PdfReader(input_path)
+            if pikepdf is not None:
+                pdf = _open_with_pikepdf(input_path, password or '')
+                if pdf is None:
+                    return {
+                        'success': False,
+                        'error': 'Incorrect password provided' if password else 'PDF is encrypted, password required'
+                    }
+                
+                with pdf:
+                    if pdf.is_encrypted and not password:
+                        return {
+                            'success': False,
+                            'error': 'PDF is encrypted, password required'
+                        }
+                    
+                    # Saving without encryption also drops the permission flags
+                    pdf.save(output_path)
+                
+                return {
+                    'success': True,
+                    'input_file': input_path,
+                    'output_file': output_path,
+                    'message': 'Restrictions removed (if any existed)'
+                }
+            
+            reader = _read_pdf(input_path)
             
             # If encrypted, try to decrypt
             if reader.is_encrypted and password:
@@ -214,17 +484,11 @@ class PDFUnlocker:
                 }
             
             # Create new PDF without restrictions
-            writer = PdfWriter()
-            for page in reader.pages:
-                writer.add_page(page)
-            
-            # Add metadata but remove restrictions
-            if reader.metadata:
-                metadata = dict(reader.metadata)
-                writer.add_metadata(metadata)
+            # The clone keeps metadata but not the encryption and its permission flags
+            writer = PdfWriter(clone_from=reader)
             
             # Write unrestricted PDF
-            with open(output_path, 'wb') as output_file:
+            with open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as output_file:
                 writer.write(output_file)
             
             return {
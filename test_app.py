@@ -10,40 +10,59 @@ import unittest
 import tempfile
 import shutil
 from io import BytesIO
-from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+from unittest.mock import patch
 
 # Add modules to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import app
+from app import app, find_free_port, purge_expired_files, register_file, OUTPUT_FOLDER
 from modules.pdf_merger import PDFMerger
 from modules.pdf_splitter import PDFSplitter
 from modules.pdf_compressor import PDFCompressor
 from modules.pdf_converter import PDFConverter
 from modules.pdf_unlocker import PDFUnlocker
-from modules.error_handler import ErrorHandler, FileValidationError, ProcessingError
+from modules.error_handler import ErrorHandler, FileValidationError, ProcessingError, sniff_mime_type
 
 
 class TestPDFModules(unittest.TestCase):
     """Test PDF processing modules."""
     
-    def setUp(self):
-        """Set up test fixtures."""
-        self.test_dir = tempfile.mkdtemp()
-        self.merger = PDFMerger()
-        self.splitter = PDFSplitter()
-        self.compressor = PDFCompressor()
-        self.converter = PDFConverter()
-        self.unlocker = PDFUnlocker()
-    
-    def tearDown(self):
+    @classmethod
+    def setUpClass(cls):
+        """Set up test fixtures shared by the class; the processors are stateless."""
+        cls.test_dir = tempfile.mkdtemp()
+        cls.merger = PDFMerger()
+        cls.splitter = PDFSplitter()
+        cls.compressor = PDFCompressor()
+        cls.converter = PDFConverter()
+        cls.unlocker = PDFUnlocker()
+    
+    @classmethod
+    def tearDownClass(cls):
         """Clean up test fixtures."""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+        shutil.rmtree(cls.test_dir, ignore_errors=True)
     
     def test_pdf_merger_initialization(self):
         """Test PDF merger initialization."""
         self.assertIsInstance(self.merger, PDFMerger)
-        self.assertIsNotNone(self.merger.writer)
+    
+    def test_merge_calls_are_independent(self):
+        """Test that a merger instance does not carry pages over between merges."""
+        from pypdf import PdfReader, PdfWriter
+        
+        source = os.path.join(self.test_dir, f'{self._testMethodName}_source.pdf')
+        writer = PdfWriter()
+        for _ in range(3):
+            writer.add_blank_page(width=72, height=72)
+        writer.write(source)
+        
+        output = os.path.join(self.test_dir, f'{self._testMethodName}_merged.pdf')
+        self.assertTrue(self.merger.merge_pdfs([source, source], output, ['1-2', 'all']))
+        self.assertEqual(len(PdfReader(output).pages), 5)
+        
+        self.assertTrue(self.merger.merge_pdfs([source], output))
+        self.assertEqual(len(PdfReader(output).pages), 3)
     
     def test_pdf_splitter_initialization(self):
         """Test PDF splitter initialization."""
@@ -62,6 +81,452 @@ class TestPDFModules(unittest.TestCase):
         """Test PDF unlocker initialization."""
         self.assertIsInstance(self.unlocker, PDFUnlocker)
     
+    def test_unlock_pdf(self):
+        """Test removing a user password from an encrypted PDF."""
+        from pypdf import PdfReader, PdfWriter
+        
+        source = os.path.join(self.test_dir, f'{self._testMethodName}_locked.pdf')
+        writer = PdfWriter()
+        writer.add_blank_page(width=72, height=72)
+        writer.encrypt('secret', algorithm='RC4-128')
+        writer.write(source)
+        
+        self.assertTrue(self.unlocker.check_pdf_encryption(source, detailed=False)['is_encrypted'])
+        
+        output = os.path.join(self.test_dir, f'{self._testMethodName}_unlocked.pdf')
+        self.assertFalse(self.unlocker.unlock_pdf(source, output, 'wrong')['success'])
+        
+        result = self.unlocker.unlock_pdf(source, output, 'secret')
+        self.assertTrue(result['success'])
+        self.assertEqual(result['pages_unlocked'], 1)
+        self.assertFalse(PdfReader(output).is_encrypted)
+        self.assertFalse(self.unlocker.check_pdf_encryption(output, detailed=False)['is_encrypted'])
+    
+    def test_compression_strips_metadata(self):
+        """Test that metadata-stripping compression drops the cloned /Info entries."""
+        from pypdf import PdfReader, PdfWriter
+        
+        source = os.path.join(self.test_dir, f'{self._testMethodName}_source.pdf')
+        writer = PdfWriter()
+        writer.add_blank_page(width=72, height=72)
+        writer.add_metadata({'/Title': 'Quarterly report', '/Author': 'Finance'})
+        writer.write(source)
+        
+        output = os.path.join(self.test_dir, f'{self._testMethodName}_out.pdf')
+        for compress in (self.compressor.remove_metadata, self.compressor.optimize_all,
+                         self.compressor.compress_pdf_minimal):
+            self.assertTrue(compress(source, output)['success'])
+            metadata = PdfReader(output).metadata
+            self.assertNotIn('/Title', metadata)
+            self.assertNotIn('/Author', metadata)
+        
+        for compress in (self.compressor.compress_pdf_alternative,
+                         self.compressor.compress_pdf_advanced):
+            self.assertTrue(compress(source, output, 'high')['success'])
+            metadata = PdfReader(output).metadata
+            self.assertNotIn('/Title', metadata)
+            self.assertNotIn('/Author', metadata)
+    
+    def test_compress_image_heavy_pdf_with_dense_content(self):
+        """Test that dense Flate content streams do not stop images from being downsampled."""
+        import zlib
+        import img2pdf
+        from PIL import Image
+        from pypdf import PdfReader, PdfWriter
+        from pypdf.generic import NameObject, StreamObject
+        
+        photo = BytesIO()
+        Image.frombytes('RGB', (400, 400), os.urandom(400 * 400 * 3)).save(photo, 'JPEG', quality=95)
+        writer = PdfWriter(clone_from=PdfReader(BytesIO(img2pdf.convert(photo.getvalue()))))
+        
+        # Pad the page content with random bytes so its Flate stream looks already optimized
+        page = writer.pages[0]
+        content = StreamObject()
+        content._data = zlib.compress(page.get_contents().get_data() + b'\n%' + os.urandom(8192).hex().encode())
+        content[NameObject('/Filter')] = NameObject('/FlateDecode')
+        page[NameObject('/Contents')] = writer._add_object(content)
+        source = os.path.join(self.test_dir, f'{self._testMethodName}_source.pdf')
+        writer.write(source)
+        self.assertTrue(self.compressor._is_already_optimized(PdfReader(source).pages))
+        
+        # Recompressing the dense stream is skipped rather than wrapped in another Flate layer
+        self.compressor._compress_content_streams(writer.pages, 'high')
+        self.assertIs(writer.pages[0]['/Contents'].get_object(), content)
+        
+        output = os.path.join(self.test_dir, f'{self._testMethodName}_out.pdf')
+        result = self.compressor.compress_pdf(source, output, 'high')
+        self.assertTrue(result['success'])
+        self.assertLess(os.path.getsize(output), os.path.getsize(source))
+        self.assertNotIn('note', result)
+    
+    def test_resize_image_honours_png_compress_level(self):
+        """Test that PNG output uses the requested zlib level unless optimize is asked for."""
+        from PIL import Image
+        
+        source = os.path.join(self.test_dir, f'{self._testMethodName}_source.png')
+        Image.linear_gradient('L').resize((512, 512)).save(source)
+        output = os.path.join(self.test_dir, f'{self._testMethodName}_out.png')
+        
+        fast = self.converter.resize_image(source, output, 1024, 1024, png_compress_level=1)
+        small = self.converter.resize_image(source, output, 1024, 1024, png_compress_level=9)
+        optimized = self.converter.resize_image(source, output, 1024, 1024, png_compress_level=1,
+                                                png_optimize=True)
+        self.assertGreater(fast['resized_size'], small['resized_size'])
+        self.assertLessEqual(optimized['resized_size'], small['resized_size'])
+    
+    def test_encryption_scan_linearized_pdf(self):
+        """Test that encryption is detected when a linearized file's first-page trailer is far from the start."""
+        try:
+            import pikepdf
+        except ImportError:
+            self.skipTest('pikepdf is not installed')
+        
+        pdf = pikepdf.new()
+        pdf.add_blank_page(page_size=(72, 72))
+        pdf.add_blank_page(page_size=(72, 72))
+        # Hundreds of first-page objects push the first-page trailer past the scanned head
+        pdf.pages[0].Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary({
+            f'/X{i}': pdf.make_indirect(pikepdf.Stream(pdf, b'', Type=pikepdf.Name.XObject,
+                                                       Subtype=pikepdf.Name.Form, BBox=[0, 0, 1, 1]))
+            for i in range(300)
+        }))
+        
+        plain = os.path.join(self.test_dir, f'{self._testMethodName}_plain.pdf')
+        locked = os.path.join(self.test_dir, f'{self._testMethodName}_locked.pdf')
+        pdf.save(plain, linearize=True)
+        pdf.save(locked, linearize=True, encryption=pikepdf.Encryption(user='secret', owner='own', R=3,
+                                                                        aes=False, metadata=False))
+        
+        self.assertFalse(self.unlocker.check_pdf_encryption(plain, detailed=False)['is_encrypted'])
+        self.assertTrue(self.unlocker.check_pdf_encryption(locked, detailed=False)['is_encrypted'])
+    
+    def test_optimize_images_uses_image_quality(self):
+        """Test that the requested image quality reaches the re-encoded JPEGs."""
+        import img2pdf
+        from PIL import Image
+        from pypdf import PdfReader
+        
+        photo = BytesIO()
+        Image.effect_mandelbrot((600, 600), (-2, -1.5, 1, 1.5), 100).convert('RGB').save(photo, 'JPEG', quality=98)
+        source = os.path.join(self.test_dir, f'{self._testMethodName}_source.pdf')
+        with open(source, 'wb') as pdf_file:
+            pdf_file.write(img2pdf.convert(photo.getvalue()))
+        
+        def image_size(path):
+            image = next(iter(PdfReader(path).pages[0]['/Resources']['/XObject'].values())).get_object()
+            return image['/Width'], image['/Height']
+        
+        sizes = {}
+        for quality in (30, 90):
+            output = os.path.join(self.test_dir, f'{self._testMethodName}_{quality}.pdf')
+            result = self.compressor.optimize_images_in_pdf(source, output, image_quality=quality)
+            self.assertTrue(result['success'])
+            sizes[quality] = result['optimized_size']
+            # Medium effort re-encodes images without lowering their resolution
+            self.assertEqual(image_size(output), (600, 600))
+        self.assertLess(sizes[30], sizes[90])
+        self.assertLess(sizes[90], os.path.getsize(source))
+        
+        output = os.path.join(self.test_dir, f'{self._testMethodName}_high.pdf')
+        self.assertTrue(self.compressor.optimize_all(source, output, 'high', image_quality=90)['success'])
+        self.assertEqual(image_size(output), (396, 396))
+    
+    def test_failed_ghostscript_defers_to_plan(self):
+        """Test that a Ghostscript failure hands over to the plan instead of running another method itself."""
+        import subprocess
+        from modules import pdf_compressor
+        
+        source = self._write_image_pdf('source')
+        output = os.path.join(self.test_dir, f'{self._testMethodName}_out.pdf')
+        failed = subprocess.CompletedProcess([], 1, stdout=b'', stderr=b'gs crashed')
+        advanced = PDFCompressor.compress_pdf_advanced
+        
+        with patch.object(pdf_compressor, 'QPDF_PATH', None), \
+                patch.object(PDFCompressor, '_check_gs', return_value=True), \
+                patch('subprocess.run', return_value=failed), \
+                patch.object(PDFCompressor, 'compress_pdf_advanced', autospec=True, side_effect=advanced) as spy:
+            result = self.compressor.compress_pdf_ghostscript(source, output)
+            self.assertFalse(result['success'])
+            self.assertIn('gs crashed', result['error'])
+            spy.assert_not_called()
+            
+            # Image plan: ghostscript, qpdf (not installed), advanced, alternative, minimal
+            self.assertTrue(self.compressor.compress_pdf(source, output, 'high')['success'])
+            self.assertEqual(spy.call_count, 1)
+    
+    def test_converter_memory_budget(self):
+        """Test that poppler processes are limited to what fits in available memory."""
+        from pypdf import PdfWriter
+        from modules import pdf_converter
+        
+        source = os.path.join(self.test_dir, f'{self._testMethodName}_a4.pdf')
+        writer = PdfWriter()
+        writer.add_blank_page(width=595, height=842)
+        writer.write(source)
+        
+        self.assertGreater(pdf_converter._available_memory(), 0)
+        
+        # An A4 raster at 300 dpi needs about 33 MB
+        with patch.object(pdf_converter, '_available_memory', return_value=200 * 1024 ** 2):
+            self.assertEqual(self.converter._memory_safe_thread_count(source, 300, 8), 3)
+            self.assertEqual(self.converter._memory_safe_thread_count(source, 300, 2), 2)
+        with patch.object(pdf_converter, '_available_memory', return_value=32 * 1024 ** 2):
+            with self.assertRaises(MemoryError):
+                self.converter._memory_safe_thread_count(source, 300, 8)
+        with patch.object(pdf_converter, '_available_memory', return_value=None):
+            self.assertEqual(self.converter._memory_safe_thread_count(source, 300, 8), 8)
+    
+    def test_compress_pdf_zopfli(self):
+        """Test that Zopfli recompression shrinks Flate streams without changing their content."""
+        from pypdf import PdfReader, PdfWriter
+        from pypdf.generic import DecodedStreamObject, NameObject
+        
+        source = os.path.join(self.test_dir, f'{self._testMethodName}_source.pdf')
+        writer = PdfWriter()
+        for page_num in range(4):
+            page = writer.add_blank_page(width=612, height=792)
+            content = DecodedStreamObject()
+            content.set_data(b''.join(b'BT /F1 12 Tf 72 %d Td (Page %d line %d) Tj ET\n' % (y, page_num, y)
+                                      for y in range(700)))
+            page[NameObject('/Contents')] = writer._add_object(content)
+        writer.write(source)
+        
+        output = os.path.join(self.test_dir, f'{self._testMethodName}_out.pdf')
+        result = self.compressor.compress_pdf_zopfli(source, output)
+        self.assertTrue(result['success'], result.get('error'))
+        self.assertLess(result['compressed_size'], result['original_size'])
+        
+        original, compressed = PdfReader(source), PdfReader(output)
+        for before, after in zip(original.pages, compressed.pages):
+            self.assertEqual(before.get_contents().get_data(), after.get_contents().get_data())
+            self.assertEqual(after['/Contents'].get_object()['/Filter'], '/FlateDecode')
+    
+    def test_find_password_in_worker_pool(self):
+        """Test that long candidate lists are checked in worker processes, stopping at the first hit."""
+        from concurrent.futures import ProcessPoolExecutor
+        from pypdf import PdfWriter
+        from modules.pdf_unlocker import PARALLEL_PASSWORD_MIN, _parse_for_guessing
+        
+        source = os.path.join(self.test_dir, f'{self._testMethodName}_locked.pdf')
+        writer = PdfWriter()
+        writer.add_blank_page(width=72, height=72)
+        writer.encrypt('secret', algorithm='RC4-128')
+        writer.write(source)
+        
+        candidates = [f'guess{i}' for i in range(PARALLEL_PASSWORD_MIN * 2)]
+        candidates[10] = 'secret'
+        reader = _parse_for_guessing(source)
+        shutdown = ProcessPoolExecutor.shutdown
+        with patch('os.cpu_count', return_value=2), \
+                patch.object(ProcessPoolExecutor, 'shutdown', autospec=True, side_effect=shutdown) as spy:
+            self.assertEqual(self.unlocker._find_password(reader, source, candidates), 'secret')
+            self.assertTrue(any(call.kwargs.get('cancel_futures') for call in spy.call_args_list))
+            
+            spy.reset_mock()
+            self.assertIsNone(self.unlocker._find_password(reader, source, candidates[11:]))
+            self.assertFalse(any(call.kwargs.get('cancel_futures') for call in spy.call_args_list))
+    
+    def test_encryption_scan_incrementally_updated_pdf(self):
+        """Test encryption detection on files with an appended incremental update."""
+        from pypdf import PdfReader, PdfWriter
+        from pypdf.generic import NameObject, NumberObject
+        
+        def append_update(path, count):
+            # Add padding objects in a new xref section whose trailer repeats the old one
+            trailer = PdfReader(path).trailer
+            with open(path, 'rb') as pdf_file:
+                data = pdf_file.read()
+            prev = int(data.rsplit(b'startxref', 1)[1].split()[0])
+            size = trailer['/Size']
+            update = BytesIO()
+            offsets = []
+            for number in range(size, size + count):
+                offsets.append(len(data) + update.tell())
+                update.write(b'%d 0 obj\n<< /Pad %d >>\nendobj\n' % (number, number))
+            xref = len(data) + update.tell()
+            update.write(b'xref\n%d %d\n' % (size, count))
+            update.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+            trailer[NameObject('/Size')] = NumberObject(size + count)
+            trailer[NameObject('/Prev')] = NumberObject(prev)
+            update.write(b'trailer\n')
+            trailer.write_to_stream(update)
+            update.write(b'\nstartxref\n%d\n%%%%EOF\n' % xref)
+            with open(path, 'ab') as pdf_file:
+                pdf_file.write(update.getvalue())
+        
+        for encrypt in (False, True):
+            source = os.path.join(self.test_dir, f'{self._testMethodName}_{encrypt}.pdf')
+            writer = PdfWriter()
+            writer.add_blank_page(width=72, height=72)
+            if encrypt:
+                writer.encrypt('secret', algorithm='RC4-128')
+            writer.write(source)
+            append_update(source, 300)
+            
+            self.assertEqual(PdfReader(source).is_encrypted, encrypt)
+            self.assertEqual(self.unlocker.check_pdf_encryption(source, detailed=False)['is_encrypted'], encrypt)
+    
+    def _write_text_pdf(self, name, pages=2):
+        """Write a small PDF whose pages draw text with a font resource."""
+        from pypdf import PdfWriter
+        from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+        
+        path = os.path.join(self.test_dir, f'{self._testMethodName}_{name}.pdf')
+        writer = PdfWriter()
+        font = writer._add_object(DictionaryObject({
+            NameObject('/Type'): NameObject('/Font'),
+            NameObject('/Subtype'): NameObject('/Type1'),
+            NameObject('/BaseFont'): NameObject('/Helvetica'),
+        }))
+        for page_num in range(pages):
+            page = writer.add_blank_page(width=612, height=792)
+            page[NameObject('/Resources')] = DictionaryObject({
+                NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})
+            })
+            content = DecodedStreamObject()
+            content.set_data(b'BT /F1 24 Tf 72 700 Td (Page %d) Tj ET' % (page_num + 1))
+            page[NameObject('/Contents')] = writer._add_object(content)
+        writer.write(path)
+        return path
+    
+    def _write_image_pdf(self, name, size=(400, 300)):
+        """Write a one-page PDF holding a single JPEG image."""
+        import img2pdf
+        from PIL import Image
+        
+        photo = BytesIO()
+        Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 100).convert('RGB').save(photo, 'JPEG', quality=95)
+        path = os.path.join(self.test_dir, f'{self._testMethodName}_{name}.pdf')
+        with open(path, 'wb') as pdf_file:
+            pdf_file.write(img2pdf.convert(photo.getvalue()))
+        return path
+    
+    def test_classify_pdf(self):
+        """Test that documents are classified by what makes up most of their bytes."""
+        from pypdf import PdfReader, PdfWriter
+        
+        vector = os.path.join(self.test_dir, f'{self._testMethodName}_vector.pdf')
+        writer = PdfWriter()
+        writer.add_blank_page(width=72, height=72)
+        writer.write(vector)
+        
+        self.assertEqual(self.compressor._classify_pdf(PdfReader(self._write_text_pdf('text'))), 'text_heavy')
+        self.assertEqual(self.compressor._classify_pdf(PdfReader(self._write_image_pdf('image'))), 'image_heavy')
+        self.assertEqual(self.compressor._classify_pdf(PdfReader(vector)), 'vector_heavy')
+    
+    def test_compression_plan_cascade(self):
+        """Test that compress_pdf follows the plan for the document class until a method pays off."""
+        from modules import pdf_compressor
+        
+        source = self._write_text_pdf('source')
+        output = os.path.join(self.test_dir, f'{self._testMethodName}_out.pdf')
+        calls = []
+        
+        def method(name, ratio):
+            def run(*args, **kwargs):
+                calls.append(name)
+                with open(output, 'wb') as output_file:
+                    output_file.write(b'%PDF-1.4\n')
+                return {'success': True, 'compression_ratio': ratio}
+            return run
+        
+        with patch.object(pdf_compressor, 'QPDF_PATH', '/usr/bin/qpdf'), \
+                patch.object(PDFCompressor, '_check_gs', return_value=False), \
+                patch.object(PDFCompressor, 'compress_pdf_advanced', side_effect=method('advanced', 2)), \
+                patch.object(PDFCompressor, 'compress_pdf_qpdf', side_effect=method('qpdf', 20)), \
+                patch.object(PDFCompressor, 'compress_pdf_alternative', side_effect=method('alternative', 30)):
+            result = self.compressor.compress_pdf(source, output, 'medium')
+        
+        # Text plan: advanced, qpdf, ghostscript (not installed), alternative, minimal
+        self.assertEqual(calls, ['advanced', 'qpdf'])
+        self.assertEqual(result['compression_ratio'], 20)
+    
+    def test_downsample_images(self):
+        """Test that JPEG images are scaled down and re-encoded in place."""
+        from pypdf import PdfReader, PdfWriter
+        from modules.pdf_compressor import IMAGE_DOWNSAMPLE_SCALE
+        
+        writer = PdfWriter(clone_from=PdfReader(self._write_image_pdf('source', (400, 300))))
+        image = next(iter(writer.pages[0]['/Resources']['/XObject'].values())).get_object()
+        original_length = len(image._data)
+        
+        self.compressor._downsample_images(writer.pages)
+        self.assertEqual(image['/Width'], int(400 * IMAGE_DOWNSAMPLE_SCALE))
+        self.assertEqual(image['/Height'], int(300 * IMAGE_DOWNSAMPLE_SCALE))
+        self.assertLess(len(image._data), original_length)
+    
+    def test_compress_pdf_qpdf(self):
+        """Test the qpdf command line and how its exit codes are treated."""
+        import subprocess
+        from modules import pdf_compressor
+        
+        source = self._write_text_pdf('source')
+        output = os.path.join(self.test_dir, f'{self._testMethodName}_out.pdf')
+        
+        with patch.object(pdf_compressor, 'QPDF_PATH', None):
+            self.assertFalse(self.compressor.compress_pdf_qpdf(source, output)['success'])
+        
+        def fake_qpdf(returncode):
+            def run(command, **kwargs):
+                shutil.copyfile(command[-2], command[-1])
+                return subprocess.CompletedProcess(command, returncode, stderr=b'damaged file')
+            return run
+        
+        with patch.object(pdf_compressor, 'QPDF_PATH', '/usr/bin/qpdf'):
+            # Exit code 3 means the output was written with warnings
+            with patch('subprocess.run', side_effect=fake_qpdf(3)) as run:
+                result = self.compressor.compress_pdf_qpdf(source, output, 'high')
+            self.assertTrue(result['success'])
+            self.assertIn('--compression-level=9', run.call_args[0][0])
+            self.assertEqual(run.call_args[0][0][-2:], [source, output])
+            
+            with patch('subprocess.run', side_effect=fake_qpdf(2)):
+                result = self.compressor.compress_pdf_qpdf(source, output)
+            self.assertFalse(result['success'])
+            self.assertIn('damaged file', result['error'])
+    
+    def test_split_and_merge_with_and_without_pikepdf(self):
+        """Test that the pikepdf and pypdf paths of the splitter and merger give the same pages."""
+        from pypdf import PdfReader
+        from modules import pdf_merger, pdf_splitter
+        
+        source = self._write_text_pdf('source', pages=5)
+        ranges = [{'start': 1, 'end': 2, 'name': 'first'}, {'start': 3, 'end': 9, 'name': 'rest'}]
+        
+        for backend in (pdf_splitter.pikepdf, None):
+            if backend is None and pdf_splitter.pikepdf is None:
+                continue
+            label = 'pypdf' if backend is None else 'pikepdf'
+            output_dir = os.path.join(self.test_dir, f'{self._testMethodName}_{label}')
+            merged = os.path.join(output_dir, 'merged.pdf')
+            with patch.object(pdf_splitter, 'pikepdf', backend), patch.object(pdf_merger, 'pikepdf', backend):
+                first, rest = self.splitter.split_pdf(source, output_dir, ranges)
+                self.assertTrue(self.merger.merge_pdfs([rest, first, rest], merged, ['2', 'all', '1-2']))
+            
+            self.assertEqual(len(PdfReader(first).pages), 2)
+            self.assertEqual(len(PdfReader(rest).pages), 3)
+            texts = [page.extract_text() for page in PdfReader(merged).pages]
+            self.assertEqual(texts, ['Page 4', 'Page 1', 'Page 2', 'Page 3', 'Page 4'])
+    
+    def test_encryption_check_metadata_fields(self):
+        """Test that check_pdf_encryption reports the file size and only the requested metadata."""
+        from pypdf import PdfWriter
+        
+        source = os.path.join(self.test_dir, f'{self._testMethodName}_source.pdf')
+        writer = PdfWriter()
+        writer.add_blank_page(width=72, height=72)
+        writer.add_metadata({'/Title': 'Report', '/Author': 'Finance'})
+        writer.write(source)
+        
+        info = self.unlocker.check_pdf_encryption(source)
+        self.assertEqual(info['file_size'], os.path.getsize(source))
+        self.assertEqual(info['pages'], 1)
+        self.assertEqual(info['metadata']['/Author'], 'Finance')
+        
+        info = self.unlocker.check_pdf_encryption(source, fields=['/Title', '/Subject'])
+        self.assertEqual(info['metadata'], {'/Title': 'Report'})
+        self.assertNotIn('metadata', self.unlocker.check_pdf_encryption(source, fields=[]))
+    
     def test_page_range_parsing(self):
         """Test page range parsing in merger."""
         # Test valid ranges
@@ -73,16 +538,19 @@ class TestPDFModules(unittest.TestCase):
         
         pages = self.merger._parse_page_range("1-3,5,7-9", 10)
         self.assertEqual(pages, [0, 1, 2, 4, 6, 7, 8])
+        
+        # Single pages and single ranges are clamped to the document
+        self.assertEqual(self.merger._parse_page_range("5", 10), [4])
+        self.assertEqual(self.merger._parse_page_range("0", 10), [])
+        self.assertEqual(self.merger._parse_page_range("8-20", 10), [7, 8, 9])
     
     def test_file_validation_with_mock_file(self):
         """Test file validation with mock file object."""
-        # Create a mock file object
-        mock_file = MagicMock()
-        mock_file.filename = 'test.pdf'
-        mock_file.content_length = 1024
-        mock_file.mimetype = 'application/pdf'
-        mock_file.seek = MagicMock()
-        mock_file.tell = MagicMock(return_value=1024)
+        # Create a mock file object with just the attributes validation uses
+        mock_file = SimpleNamespace(filename='test.pdf', content_length=1024,
+                                    mimetype='application/pdf',
+                                    seek=lambda *args: None,
+                                    read=lambda size=-1: b'%PDF-1.4\n')
         
         validation = ErrorHandler.validate_file_upload(mock_file, {'.pdf'})
         self.assertTrue(validation['valid'])
@@ -100,14 +568,23 @@ class TestErrorHandler(unittest.TestCase):
     
     def test_file_validation_invalid_extension(self):
         """Test file validation with invalid extension."""
-        mock_file = MagicMock()
-        mock_file.filename = 'test.txt'
-        mock_file.content_length = 1024
+        mock_file = SimpleNamespace(filename='test.txt', content_length=1024)
         
         validation = ErrorHandler.validate_file_upload(mock_file, {'.pdf'})
         self.assertFalse(validation['valid'])
         self.assertEqual(validation['error_code'], 'INVALID_EXTENSION')
     
+    def test_file_validation_too_large(self):
+        """Test that uploads over the size limit are rejected without reading them."""
+        mock_file = SimpleNamespace(filename='test.pdf', content_length=ErrorHandler.MAX_FILE_SIZE + 1)
+        
+        validation = ErrorHandler.validate_file_upload(mock_file, {'.pdf'})
+        self.assertFalse(validation['valid'])
+        self.assertEqual(validation['error_code'], 'FILE_TOO_LARGE')
+        
+        validation = ErrorHandler.validate_file_upload(mock_file, {'.pdf'}, max_size=1024)
+        self.assertEqual(validation['error_code'], 'FILE_TOO_LARGE')
+    
     def test_page_range_validation(self):
         """Test page range validation."""
         # Valid ranges
@@ -127,6 +604,13 @@ class TestErrorHandler(unittest.TestCase):
         self.assertNotIn('../', sanitized)
         self.assertNotIn('/etc/', sanitized)
     
+    def test_mime_type_sniffing(self):
+        """Test MIME type detection from magic bytes."""
+        self.assertEqual(sniff_mime_type(b'%PDF-1.7\n'), 'application/pdf')
+        self.assertEqual(sniff_mime_type(b'\x89PNG\r\n\x1a\n'), 'image/png')
+        self.assertEqual(sniff_mime_type(b'\xff\xd8\xff\xe0'), 'image/jpeg')
+        self.assertIsNone(sniff_mime_type(b'plain text'))
+    
     def test_error_response_creation(self):
         """Test error response creation."""
         response, status_code = ErrorHandler.create_error_response("Test error", "TEST_ERROR", 400)
@@ -139,50 +623,51 @@ class TestErrorHandler(unittest.TestCase):
 class TestFlaskApp(unittest.TestCase):
     """Test Flask application endpoints."""
     
-    def setUp(self):
-        """Set up test client."""
-        self.app = app.test_client()
-        self.app.testing = True
+    @classmethod
+    def setUpClass(cls):
+        """Set up a test client shared by the class."""
+        cls.client = app.test_client()
+        cls.client.testing = True
     
     def test_index_page(self):
         """Test index page loads."""
-        response = self.app.get('/')
+        response = self.client.get('/')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'PyPDF Toolkit Web', response.data)
     
     def test_merge_page(self):
         """Test merge page loads."""
-        response = self.app.get('/merge')
+        response = self.client.get('/merge')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Merge PDFs', response.data)
     
     def test_split_page(self):
         """Test split page loads."""
-        response = self.app.get('/split')
+        response = self.client.get('/split')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Split PDF', response.data)
     
     def test_compress_page(self):
         """Test compress page loads."""
-        response = self.app.get('/compress')
+        response = self.client.get('/compress')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Compress PDF', response.data)
     
     def test_convert_page(self):
         """Test convert page loads."""
-        response = self.app.get('/convert')
+        response = self.client.get('/convert')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Convert Files', response.data)
     
     def test_unlock_page(self):
         """Test unlock page loads."""
-        response = self.app.get('/unlock')
+        response = self.client.get('/unlock')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Unlock PDF', response.data)
     
     def test_api_merge_no_files(self):
         """Test merge API with no files."""
-        response = self.app.post('/api/merge')
+        response = self.client.post('/api/merge')
         self.assertEqual(response.status_code, 200)
         data = response.get_json()
         self.assertFalse(data['success'])
@@ -190,35 +675,35 @@ class TestFlaskApp(unittest.TestCase):
     
     def test_api_split_no_file(self):
         """Test split API with no file."""
-        response = self.app.post('/api/split')
+        response = self.client.post('/api/split')
         self.assertEqual(response.status_code, 200)
         data = response.get_json()
         self.assertFalse(data['success'])
     
     def test_api_compress_no_file(self):
         """Test compress API with no file."""
-        response = self.app.post('/api/compress')
+        response = self.client.post('/api/compress')
         self.assertEqual(response.status_code, 200)
         data = response.get_json()
         self.assertFalse(data['success'])
     
     def test_api_convert_no_files(self):
         """Test convert API with no files."""
-        response = self.app.post('/api/convert', data={'conversion_type': 'images_to_pdf'})
+        response = self.client.post('/api/convert', data={'conversion_type': 'images_to_pdf'})
         self.assertEqual(response.status_code, 200)
         data = response.get_json()
         self.assertFalse(data['success'])
     
     def test_api_unlock_no_file(self):
         """Test unlock API with no file."""
-        response = self.app.post('/api/unlock')
+        response = self.client.post('/api/unlock')
         self.assertEqual(response.status_code, 200)
         data = response.get_json()
         self.assertFalse(data['success'])
     
     def test_404_api_endpoint(self):
         """Test 404 for non-existent API endpoint."""
-        response = self.app.get('/api/nonexistent')
+        response = self.client.get('/api/nonexistent')
         self.assertEqual(response.status_code, 404)
         data = response.get_json()
         self.assertFalse(data['success'])
@@ -226,22 +711,101 @@ class TestFlaskApp(unittest.TestCase):
     
     def test_404_page(self):
         """Test 404 for non-existent page."""
-        response = self.app.get('/nonexistent')
+        response = self.client.get('/nonexistent')
+        self.assertEqual(response.status_code, 404)
+    
+    def test_api_merge_saves_identical_uploads_once(self):
+        """Test that repeated uploads in one merge request share a single saved file."""
+        from pypdf import PdfWriter
+        
+        writer = PdfWriter()
+        writer.add_blank_page(width=72, height=72)
+        pdf = BytesIO()
+        writer.write(pdf)
+        
+        with patch('modules.pdf_merger.PDFMerger.merge_pdfs', return_value=True) as merge:
+            response = self.client.post('/api/merge', data={'files': [
+                (BytesIO(pdf.getvalue()), 'a.pdf'),
+                (BytesIO(pdf.getvalue()), 'b.pdf'),
+            ]}, content_type='multipart/form-data')
+        
+        self.assertTrue(response.get_json()['success'])
+        first, second = merge.call_args[0][0]
+        self.addCleanup(os.remove, first)
+        self.assertEqual(first, second)
+        self.assertTrue(os.path.exists(first))
+    
+    def test_download_etag(self):
+        """Test that downloads carry a strong ETag and answer revalidation with 304."""
+        import uuid
+        
+        filename = f'merged_{uuid.uuid4()}.pdf'
+        path = os.path.join(OUTPUT_FOLDER, filename)
+        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+        with open(path, 'wb') as output_file:
+            output_file.write(b'%PDF-1.4\n%%EOF\n')
+        self.addCleanup(os.remove, path)
+        
+        response = self.client.get(f'/download/{filename}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], f'"{filename}"')
+        response.close()
+        
+        response = self.client.get(f'/download/{filename}', headers={'If-None-Match': f'"{filename}"'})
+        self.assertEqual(response.status_code, 304)
+        
+        response = self.client.get('/download/missing.pdf')
         self.assertEqual(response.status_code, 404)
+    
+    def test_janitor_purges_expired_files(self):
+        """Test that only registered files past their expiry are deleted."""
+        from collections import OrderedDict
+        
+        test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, test_dir, ignore_errors=True)
+        expired, fresh = os.path.join(test_dir, 'expired.pdf'), os.path.join(test_dir, 'fresh.pdf')
+        expired_dir = os.path.join(test_dir, 'expired_dir')
+        for path in (expired, fresh):
+            with open(path, 'wb') as f:
+                f.write(b'%PDF-1.4\n')
+        os.makedirs(expired_dir)
+        
+        with patch('app._file_registry', OrderedDict()):
+            register_file(expired, expires_at=100)
+            register_file(expired_dir, expires_at=150)
+            register_file(os.path.join(test_dir, 'already_gone.pdf'), expires_at=150)
+            register_file(fresh, expires_at=300)
+            purge_expired_files(now=200)
+        
+        self.assertFalse(os.path.exists(expired))
+        self.assertFalse(os.path.exists(expired_dir))
+        self.assertTrue(os.path.exists(fresh))
+    
+    def test_find_free_port_skips_busy_port(self):
+        """Test that the startup port probe does not report a listening port as free."""
+        import socket
+        
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as busy:
+            busy.bind(('localhost', 0))
+            busy.listen()
+            port = busy.getsockname()[1]
+            self.assertIsNone(find_free_port(port, port))
 
 
 class TestIntegration(unittest.TestCase):
     """Integration tests for the complete system."""
     
-    def setUp(self):
-        """Set up integration test environment."""
-        self.app = app.test_client()
-        self.app.testing = True
-        self.test_dir = tempfile.mkdtemp()
+    @classmethod
+    def setUpClass(cls):
+        """Set up integration test environment shared by the class."""
+        cls.client = app.test_client()
+        cls.client.testing = True
+        cls.test_dir = tempfile.mkdtemp()
     
-    def tearDown(self):
+    @classmethod
+    def tearDownClass(cls):
         """Clean up integration test environment."""
-        shutil.rmtree(self.test_dir, ignore_errors=True)
+        shutil.rmtree(cls.test_dir, ignore_errors=True)
     
     def create_mock_pdf_file(self, filename="test.pdf", size=1024):
         """Create a mock PDF file for testing."""
@@ -252,7 +816,7 @@ class TestIntegration(unittest.TestCase):
         # Test with mock PDF file
         mock_pdf = self.create_mock_pdf_file()
         
-        response = self.app.post('/api/merge', data={
+        response = self.client.post('/api/merge', data={
             'files': [mock_pdf]
         })
         